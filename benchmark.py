@@ -0,0 +1,448 @@
+# Headless rendering benchmark for the astrological clock.
+#
+# Runs under SDL's dummy video driver, steps AstrologicalClock through
+# scripted scenarios and reports per-component frame timings.
+#
+#   python benchmark.py                 # table on stdout
+#   python benchmark.py --json out.json # also write the results as JSON
+#   python benchmark.py --check         # exit 1 if a p99 exceeds its budget
+import os
+import sys
+import json
+import time
+import random
+import threading
+import argparse
+import datetime
+import tempfile
+
+import main
+import pygame
+import ephemeris
+
+FRAME_DT = datetime.timedelta(seconds=1 / 60)
+
+# p99 budgets in milliseconds per component, for a 60 FPS frame (16.7 ms)
+BUDGETS_MS = {
+    "update": 1.0,
+    "dial": 2.0,
+    "flames": 3.0,
+    "zodiac": 1.0,
+    "decoration": 1.5,
+    "hands": 2.5,
+    "ui": 4.0,
+    "frame": 12.0,
+}
+
+# Scenario functions return the clock time and mouse position for frame i
+def idle_scenario(clock, i, frames):
+    return datetime.datetime(2024, 1, 1, 10, 10, 0) + FRAME_DT * i, (0, 0)
+
+def modal_scenario(clock, i, frames):
+    if i == 0:
+        clock.time_modal.toggle_visibility()
+    # Type and erase a time every few frames so the input text changes
+    if i % 10 == 0:
+        text = "12:34:56"
+        clock.time_modal.text = text[:(i // 10) % (len(text) + 1)]
+    mouse_pos = clock.time_modal.submit_button.rect.center if (i // 30) % 2 else (0, 0)
+    return datetime.datetime(2024, 1, 1, 10, 10, 0) + FRAME_DT * i, mouse_pos
+
+def leo_scenario(clock, i, frames):
+    # Sweep the hour hand through 142-158 degrees (07:44 to 08:16)
+    start = datetime.datetime(2024, 1, 1, 7, 44, 0)
+    return start + datetime.timedelta(minutes=32) * i / frames, (0, 0)
+
+def timewarp_scenario(clock, i, frames):
+    start = datetime.datetime(2024, 1, 1, 0, 0, 0)
+    return start + datetime.timedelta(hours=24) * i / frames, (0, 0)
+
+def decades_scenario(clock, i, frames):
+    # Thirty years of Sun and Moon signs, from tables loaded up front as a
+    # long export would have them
+    if i == 0:
+        ephemeris.preload(2000, 2030)
+    start = datetime.datetime(2000, 1, 1, 0, 0, 0)
+    return start + datetime.timedelta(days=365.25 * 30) * i / frames, (0, 0)
+
+SCENARIOS = {
+    "idle": idle_scenario,
+    "modal": modal_scenario,
+    "leo": leo_scenario,
+    "timewarp": timewarp_scenario,
+    "decades": decades_scenario,
+}
+
+# Clock options for scenarios that need more than the defaults
+SCENARIO_OPTIONS = {
+    "decades": {"sign_mode": "sun-moon"},
+}
+
+def run_scenario(scenario, frames, warmup, dirty_rects=False, particle_count=12, options=None):
+    # Deterministic time: a manual clock advanced one frame at a time
+    source = main.ManualClock()
+    engine = main.TimeEngine(source, start=datetime.datetime(2024, 1, 1))
+    clock = main.AstrologicalClock(dirty_rects=dirty_rects, particle_count=particle_count,
+                                   time_engine=engine, **(options or {}))
+    # Measure steady-state frames, not the one-off swap to the loaded images
+    clock.asset_loader.wait()
+    surface = pygame.Surface((main.WIDTH, main.HEIGHT))
+    timings = {}
+    recording = False
+
+    def record(name, seconds):
+        if recording:
+            timings.setdefault(name, []).append(seconds)
+
+    clock.stage_timer = record
+    for i in range(-warmup, frames):
+        recording = i >= 0
+        if i == 0:
+            allocations_start = main.surface_allocations
+        now, mouse_pos = scenario(clock, max(i, 0), frames)
+
+        source.advance(FRAME_DT.total_seconds())
+        engine.set_time(now)
+
+        frame_start = time.perf_counter()
+        clock.update(mouse_pos)
+        update_end = time.perf_counter()
+        clock.draw(surface)
+        frame_end = time.perf_counter()
+
+        record("update", update_end - frame_start)
+        record("frame", frame_end - frame_start)
+
+    return {
+        "timings": {name: main.summarize(samples) for name, samples in timings.items()},
+        "surface_allocations_per_frame": (main.surface_allocations - allocations_start) / frames,
+        "hand_sprite_bytes": main.hand_sprites.memory_bytes,
+    }
+
+def ephemeris_queries(count=100000):
+    # Nanoseconds per sign query, stepping through 2000-2030 either an hour
+    # at a time (nearly every answer still valid) or ~18 days at a time (a
+    # new search on every query, as in the decades scenario)
+    ephemeris.preload(2000, 2030)
+    start = datetime.datetime(2000, 1, 1)
+    results = {}
+    for label, step in (("hourly", datetime.timedelta(hours=1)),
+                        ("warp", datetime.timedelta(days=365.25 * 30) / count)):
+        times = [start + step * i for i in range(count)]
+        for name, table in (("sun", ephemeris.sun), ("moon", ephemeris.moon)):
+            query_start = time.perf_counter()
+            for when in times:
+                table.sign_at(when)
+            results[f"{name}_{label}_ns"] = (time.perf_counter() - query_start) / count * 1e9
+    return results
+
+def print_ephemeris(results):
+    print("ephemeris queries:")
+    for name, ns in results.items():
+        print(f"  {name[:-3]:<12} {ns:7.0f} ns/query")
+
+PACING_MODES = ("tick", "precise")
+
+def run_pacing(pacing, frames, warmup):
+    # Real-time frames on the (dummy) display, paced as the window paces
+    # them; the one benchmark that runs on the wall clock
+    scheduler = main.FrameScheduler(fps=60, clock=pygame.time.Clock(), pacing=pacing)
+    clock = main.AstrologicalClock(time_engine=main.TimeEngine(start=datetime.datetime(2024, 1, 1, 10, 10, 0)))
+    clock.asset_loader.wait()
+    window = pygame.display.get_surface()
+    for i in range(-warmup, frames):
+        if i == 0:
+            scheduler.present_intervals.clear()
+            scheduler.present_errors.clear()
+        clock.update((0, 0), scheduler.present_time())
+        clock.draw(window)
+        scheduler.pace()
+        pygame.display.flip()
+        scheduler.presented()
+        scheduler.wait(clock)
+    return scheduler.jitter()
+
+def pacing_comparison(frames, warmup, modes=PACING_MODES):
+    return {pacing: run_pacing(pacing, frames, warmup) for pacing in modes}
+
+def print_pacing(comparison):
+    print("frame pacing (60 FPS target):")
+    for pacing, stats in comparison.items():
+        print(f"  {pacing:<8} interval mean {stats['interval_mean_ms']:6.3f} ms  sd {stats['interval_stdev_ms']:6.3f} ms"
+              f"  |dev| p50 {stats['deviation_p50_ms']:6.3f}  p99 {stats['deviation_p99_ms']:6.3f} ms  max {stats['deviation_max_ms']:6.3f} ms"
+              f"  hands behind by {stats['present_error_mean_ms']:6.3f} ms")
+
+# Particle counts for the latency benchmark: a light frame and a heavy one
+LATENCY_PARTICLES = (12, 10000)
+
+def inject_inputs(clock, duration, seed=1):
+    # Clicks on the time button and digits typed into the modal it opens, at
+    # random moments and stamped with when they were sent, then QUIT. Each
+    # one changes what the clock shows.
+    rng = random.Random(seed)
+    button = clock.change_time_button.rect.center
+    end = time.monotonic() + duration
+    typed = None
+    while time.monotonic() < end:
+        time.sleep(rng.uniform(0.03, 0.12))
+        if typed is None or typed == 4:
+            event = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=button, button=1, sent_ns=time.monotonic_ns())
+            typed = 0 if typed is None else None
+        else:
+            digit = str(rng.randrange(10))
+            event = pygame.event.Event(pygame.KEYDOWN, key=ord(digit), unicode=digit, mod=0,
+                                       sent_ns=time.monotonic_ns())
+            typed += 1
+        pygame.event.post(event)
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+def run_input_latency(loop, particle_count, duration):
+    # The window's own main loop on the (dummy) display, in real time, with
+    # inputs injected from another thread
+    clock = main.AstrologicalClock(particle_count=particle_count,
+                                   time_engine=main.TimeEngine(start=datetime.datetime(2024, 1, 1, 10, 10, 0)))
+    clock.asset_loader.wait()
+    scheduler = main.FrameScheduler(fps=60, clock=pygame.time.Clock())
+    latency = main.InputLatency(history=100000)
+    runner = main.LOOPS[loop](pygame.display.get_surface(), clock, scheduler, main.LayoutRebuilder(clock),
+                              latency=latency)
+    pygame.event.clear()
+    injector = threading.Thread(target=inject_inputs, args=(clock, duration), daemon=True)
+    injector.start()
+    runner.run()
+    injector.join()
+    return dict(latency.stats(), effective_fps=scheduler.effective_fps)
+
+def input_latency(frames, loops=tuple(main.LOOPS), particle_counts=LATENCY_PARTICLES):
+    # As long as `frames` frames take at 60 FPS, per loop and particle count
+    return {f"{loop}/{count}": run_input_latency(loop, count, frames / 60)
+            for count in particle_counts for loop in loops}
+
+def print_input_latency(results):
+    print("input latency (to the end of the present that shows it):")
+    for name, stats in results.items():
+        line = f"  {name:<15} {stats['effective_fps']:5.1f} FPS"
+        for kind in ("click", "key"):
+            if kind in stats:
+                line += (f"  {kind} p50 {stats[kind]['p50_ms']:6.2f}  p99 {stats[kind]['p99_ms']:6.2f}"
+                         f"  mean {stats[kind]['mean_ms']:6.2f} ms")
+        print(line)
+
+# Themes the reload benchmark alternates between: the defaults, and one that
+# changes colors and radii so faces, flames, hands and layouts all rebuild
+RELOAD_THEMES = (
+    {},
+    {"colors": {"black": [10, 10, 30], "white": [255, 230, 200], "gold": [255, 80, 80],
+                "flame_on": [255, 140, 40], "flame_off": [90, 50, 30]},
+     "radii": {"zodiac": 220, "hour_flame": 290}},
+)
+
+def theme_reloads(frames, warmup, every=60):
+    # Real-time 60 FPS frames while the theme file is rewritten every `every`
+    # frames; each reload is built in the background and swapped in by
+    # LayoutRebuilder.poll() at the start of a frame
+    source = main.ManualClock()
+    clock = main.AstrologicalClock(time_engine=main.TimeEngine(source, start=datetime.datetime(2024, 1, 1, 10, 10, 0)))
+    clock.asset_loader.wait()
+    rebuilder = main.LayoutRebuilder(clock, debounce=0)
+    surface = pygame.Surface((main.WIDTH, main.HEIGHT))
+    samples = []
+    swap_samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "theme.json")
+        for i in range(-warmup, frames):
+            if i >= 0 and i % every == 0:
+                with open(path, "w") as f:
+                    json.dump(RELOAD_THEMES[(i // every) % len(RELOAD_THEMES) - 1], f)
+                rebuilder.request(theme_path=path)
+            source.advance(FRAME_DT.total_seconds())
+            frame_start = time.perf_counter()
+            swapped = rebuilder.poll()
+            clock.update((0, 0))
+            clock.draw(surface)
+            elapsed = time.perf_counter() - frame_start
+            if i >= 0:
+                samples.append(elapsed)
+                if swapped:
+                    swap_samples.append(elapsed)
+            time.sleep(max(0.0, FRAME_DT.total_seconds() - elapsed))
+    # Leave the defaults for whatever runs next
+    main.app.theme = main.Theme()
+    return {
+        "frame": main.summarize(samples),
+        "max_ms": max(samples) * 1000,
+        "swaps": len(swap_samples),
+        "swap_frame_max_ms": max(swap_samples) * 1000 if swap_samples else None,
+        "frames_over_budget": sum(1 for sample in samples if sample > FRAME_DT.total_seconds()),
+    }
+
+def print_theme_reloads(stats):
+    print(f"theme reloads: {stats['swaps']} swaps  frame mean {stats['frame']['mean_ms']:7.3f} ms"
+          f"  p99 {stats['frame']['p99_ms']:7.3f} ms  max {stats['max_ms']:7.3f} ms"
+          f"  swap frame max {stats['swap_frame_max_ms'] or 0:7.3f} ms"
+          f"  frames over 16.7 ms {stats['frames_over_budget']}")
+
+PARTICLE_COUNTS = (12, 100, 1000, 10000)
+
+def particle_scaling(frames, warmup, counts=PARTICLE_COUNTS):
+    # Idle frames with an increasingly dense central decoration
+    scaling = {}
+    for count in counts:
+        result = run_scenario(idle_scenario, frames, warmup, particle_count=count)
+        frame_ms = result["timings"]["frame"]["mean_ms"]
+        scaling[count] = {
+            "decoration": result["timings"]["decoration"],
+            "frame": result["timings"]["frame"],
+            "fps": 1000 / frame_ms,
+        }
+    return scaling
+
+def print_scaling(scaling):
+    print("particle scaling:")
+    for count, stats in scaling.items():
+        print(f"  {count:>6} particles  decoration mean {stats['decoration']['mean_ms']:7.3f} ms"
+              f"  p99 {stats['decoration']['p99_ms']:7.3f} ms  -> {stats['fps']:7.1f} FPS")
+
+CLOCK_COUNTS = (1, 4, 9, 16)
+# A spread of real time zone offsets, so the grid's hands all differ
+GRID_OFFSETS = (0, -5, 1, 9, 5.5, -8, 3, 10, -3, 2, 4, -6, 12, -10, 7, 8)
+
+def run_grid(count, frames, warmup, dirty_rects=False):
+    # A world-clock grid filling the benchmark window, on a manual clock
+    source = main.ManualClock()
+    grid = main.WorldClockGrid(GRID_OFFSETS[:count], dirty_rects=dirty_rects, time_source=source,
+                               start=datetime.datetime(2024, 1, 1, 10, 10, 0))
+    grid.asset_loader.wait()
+    surface = pygame.Surface((main.WIDTH, main.HEIGHT))
+    samples = []
+    for i in range(-warmup, frames):
+        source.advance(FRAME_DT.total_seconds())
+        frame_start = time.perf_counter()
+        grid.update((0, 0))
+        grid.draw(surface)
+        if i >= 0:
+            samples.append(time.perf_counter() - frame_start)
+    return main.summarize(samples)
+
+def clock_scaling(frames, warmup, counts=CLOCK_COUNTS, dirty_rects=False):
+    # Frame rate against the number of clocks sharing one window
+    scaling = {}
+    for count in counts:
+        frame = run_grid(count, frames, warmup, dirty_rects)
+        scaling[count] = {"frame": frame, "fps": 1000 / frame["mean_ms"]}
+    return scaling
+
+def print_clock_scaling(scaling):
+    print("clock scaling:")
+    single = scaling.get(1)
+    for count, stats in scaling.items():
+        relative = ""
+        if single is not None:
+            relative = f"  ({stats['frame']['mean_ms'] / single['frame']['mean_ms']:.1f}x one clock)"
+        print(f"  {count:>3} clocks  frame mean {stats['frame']['mean_ms']:7.3f} ms"
+              f"  p99 {stats['frame']['p99_ms']:7.3f} ms  -> {stats['fps']:7.1f} FPS{relative}")
+
+def print_results(results, budget_scale):
+    for scenario, result in results.items():
+        print(f"{scenario}:  {result['surface_allocations_per_frame']:.2f} surface allocations/frame"
+              f"  hand sprite cache {result['hand_sprite_bytes'] / 1048576:.1f} MiB")
+        for name, stats in result["timings"].items():
+            budget = BUDGETS_MS.get(name)
+            flag = ""
+            if budget is not None and stats["p99_ms"] > budget * budget_scale:
+                flag = "  OVER BUDGET"
+            print(f"  {name:<11} mean {stats['mean_ms']:7.3f} ms  p50 {stats['p50_ms']:7.3f} ms"
+                  f"  p99 {stats['p99_ms']:7.3f} ms{flag}")
+
+def over_budget(results, budget_scale):
+    failures = []
+    for scenario, result in results.items():
+        for name, stats in result["timings"].items():
+            budget = BUDGETS_MS.get(name)
+            if budget is not None and stats["p99_ms"] > budget * budget_scale:
+                failures.append((scenario, name, stats["p99_ms"], budget * budget_scale))
+    return failures
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Headless astrological clock benchmark")
+    parser.add_argument("--frames", type=int, default=600, help="measured frames per scenario")
+    parser.add_argument("--warmup", type=int, default=60, help="unmeasured frames before each scenario")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--dirty-rects", action="store_true", help="benchmark the dirty-rect mode")
+    parser.add_argument("--particles", type=main.non_negative_int, default=12, help="central decoration particle count")
+    parser.add_argument("--particle-scaling", action="store_true",
+                        help="also measure frame rate against decoration particle count")
+    parser.add_argument("--clock-scaling", action="store_true",
+                        help="also measure frame rate against world-clock grid size")
+    parser.add_argument("--pacing", action="store_true",
+                        help="also compare frame interval jitter of clock.tick() and precise pacing (real time)")
+    parser.add_argument("--theme-reload", action="store_true",
+                        help="also measure frame times while the theme is reloaded repeatedly (real time)")
+    parser.add_argument("--latency", action="store_true",
+                        help="also measure click-to-photon and keypress-to-display latency of the serial and"
+                             " threaded main loops (real time)")
+    parser.add_argument("--ephemeris", action="store_true",
+                        help="also measure Sun and Moon sign queries")
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON ('-' for stdout)")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if a p99 is over budget")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="multiply every budget, e.g. 3 for slow CI machines")
+    args = parser.parse_args()
+
+    main.app.init_display(headless=True)
+
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        results[name] = run_scenario(SCENARIOS[name], args.frames, args.warmup,
+                                     args.dirty_rects, args.particles, SCENARIO_OPTIONS.get(name))
+    scaling = particle_scaling(args.frames, args.warmup) if args.particle_scaling else None
+    grid_scaling = clock_scaling(args.frames, args.warmup, dirty_rects=args.dirty_rects) if args.clock_scaling else None
+    queries = ephemeris_queries() if args.ephemeris else None
+    pacing = pacing_comparison(args.frames, args.warmup) if args.pacing else None
+    reloads = theme_reloads(args.frames, args.warmup) if args.theme_reload else None
+    latencies = input_latency(args.frames) if args.latency else None
+
+    output = dict(results)
+    if scaling is not None:
+        output["particle_scaling"] = scaling
+    if grid_scaling is not None:
+        output["clock_scaling"] = grid_scaling
+    if queries is not None:
+        output["ephemeris"] = queries
+    if pacing is not None:
+        output["pacing"] = pacing
+    if reloads is not None:
+        output["theme_reloads"] = reloads
+    if latencies is not None:
+        output["input_latency"] = latencies
+    if args.json == "-":
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    else:
+        print_results(results, args.budget_scale)
+        if scaling is not None:
+            print_scaling(scaling)
+        if grid_scaling is not None:
+            print_clock_scaling(grid_scaling)
+        if queries is not None:
+            print_ephemeris(queries)
+        if pacing is not None:
+            print_pacing(pacing)
+        if reloads is not None:
+            print_theme_reloads(reloads)
+        if latencies is not None:
+            print_input_latency(latencies)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(output, f, indent=2)
+
+    failures = over_budget(results, args.budget_scale)
+    if args.check and failures:
+        for scenario, name, p99, budget in failures:
+            print(f"{scenario}/{name}: p99 {p99:.3f} ms > budget {budget:.3f} ms", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
@@ -0,0 +1,170 @@
+# Sun and Moon zodiac signs from precomputed ingress tables.
+#
+# The ecliptic longitudes come from the low-precision analytic series in the
+# Astronomical Almanac (Sun, ~0.01 degrees) and Meeus' truncated lunar theory
+# (Moon, ~0.3 degrees, i.e. ingress times good to well under an hour). For
+# each year the moments each body enters a new sign are found once and
+# cached to disk; a sign query is then a range check against the interval of
+# the previous answer, falling back to a binary search over the year's ~12
+# (Sun) or ~160 (Moon) ingresses.
+#
+#   python ephemeris.py 1900 2100   # precompute and cache a range of years
+#
+# Tables are in tropical (Western) signs and queried with naive local times,
+# as shown by the clock; they are converted to local time when loaded.
+import os
+import sys
+import json
+import math
+import time
+import datetime
+from bisect import bisect_right
+
+SIGNS = ("Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+         "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces")
+
+TABLE_VERSION = 1
+UNIX_EPOCH_JD = 2440587.5
+J2000_JD = 2451545.0
+
+def days_since_j2000(seconds):
+    return seconds / 86400 + UNIX_EPOCH_JD - J2000_JD
+
+def sun_longitude(seconds):
+    # Apparent ecliptic longitude in degrees for a Unix time
+    n = days_since_j2000(seconds)
+    mean_longitude = 280.460 + 0.9856474 * n
+    anomaly = math.radians(357.528 + 0.9856003 * n)
+    return (mean_longitude + 1.915 * math.sin(anomaly) + 0.020 * math.sin(2 * anomaly)) % 360
+
+def moon_longitude(seconds):
+    n = days_since_j2000(seconds)
+    mean_longitude = 218.316 + 13.176396 * n
+    anomaly = math.radians(134.963 + 13.064993 * n)
+    sun_anomaly = math.radians(357.529 + 0.98560028 * n)
+    elongation = math.radians(297.850 + 12.190749 * n)
+    latitude_argument = math.radians(93.272 + 13.229350 * n)
+    return (mean_longitude
+            + 6.289 * math.sin(anomaly)
+            - 1.274 * math.sin(anomaly - 2 * elongation)
+            + 0.658 * math.sin(2 * elongation)
+            + 0.214 * math.sin(2 * anomaly)
+            - 0.186 * math.sin(sun_anomaly)
+            - 0.114 * math.sin(2 * latitude_argument)) % 360
+
+# Longitude function and search step in seconds. Steps are short enough that
+# a body can't cross a whole sign between two samples (the Moon moves about
+# 3.3 degrees in 6 hours); neither body ever moves retrograde.
+BODIES = {
+    "sun": (sun_longitude, 86400),
+    "moon": (moon_longitude, 6 * 3600),
+}
+
+def sign_of(longitude_function, seconds):
+    return int(longitude_function(seconds) // 30) % 12
+
+def compute_ingresses(body, year):
+    # [[unix seconds, sign], ...] for the UTC year plus two days either side,
+    # so local times just around New Year also fall inside the table
+    longitude_function, step = BODIES[body]
+    start = datetime.datetime(year, 1, 1, tzinfo=datetime.timezone.utc).timestamp() - 2 * 86400
+    end = datetime.datetime(year + 1, 1, 1, tzinfo=datetime.timezone.utc).timestamp() + 2 * 86400
+
+    sign = sign_of(longitude_function, start)
+    ingresses = [[int(start), sign]]
+    t = start
+    while t < end:
+        next_t = min(t + step, end)
+        next_sign = sign_of(longitude_function, next_t)
+        if next_sign != sign:
+            # Bisect down to a second
+            low, high = t, next_t
+            while high - low > 1:
+                middle = (low + high) / 2
+                if sign_of(longitude_function, middle) == sign:
+                    low = middle
+                else:
+                    high = middle
+            ingresses.append([math.ceil(high), next_sign])
+            sign = next_sign
+        t = next_t
+    return ingresses
+
+# Ingress table for one body, one year at a time, loaded from the disk cache
+# or computed on first use. Answers are valid until the next ingress, so
+# consecutive frames normally skip the search entirely.
+class IngressTable:
+    def __init__(self, body, cache_dir="assets/cache/ephemeris"):
+        self.body = body
+        self.cache_dir = cache_dir
+        self.years = {}
+        self.valid_from = None
+        self.valid_until = None
+        self.sign = None
+
+    def cache_path(self, year):
+        return os.path.join(self.cache_dir, f"{self.body}_{year}_v{TABLE_VERSION}.json")
+
+    def load_ingresses(self, year):
+        path = self.cache_path(year)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        ingresses = compute_ingresses(self.body, year)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Written aside and renamed, as several processes may build the same year
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w") as f:
+                json.dump(ingresses, f, separators=(",", ":"))
+            os.replace(temporary, path)
+        except OSError:
+            pass
+        return ingresses
+
+    def year(self, year):
+        table = self.years.get(year)
+        if table is None:
+            ingresses = self.load_ingresses(year)
+            times = [datetime.datetime.fromtimestamp(seconds) for seconds, _ in ingresses]
+            signs = [sign for _, sign in ingresses]
+            table = self.years[year] = (times, signs)
+        return table
+
+    def sign_at(self, when):
+        # Index into SIGNS of the sign the body is in at naive local time `when`
+        if self.valid_from is not None and self.valid_from <= when < self.valid_until:
+            return self.sign
+        times, signs = self.year(when.year)
+        index = bisect_right(times, when) - 1
+        self.valid_from = times[index]
+        if index + 1 < len(times):
+            self.valid_until = times[index + 1]
+        else:
+            self.valid_until = datetime.datetime(when.year + 1, 1, 1)
+        self.sign = signs[index]
+        return self.sign
+
+sun = IngressTable("sun")
+moon = IngressTable("moon")
+
+def preload(first, last):
+    # Loads (or builds) both tables for years first..last; returns the ingress count
+    count = 0
+    for table in (sun, moon):
+        for year in range(first, last + 1):
+            count += len(table.year(year)[0])
+    return count
+
+def main_build():
+    first, last = int(sys.argv[1]), int(sys.argv[2])
+    start = time.perf_counter()
+    count = preload(first, last)
+    print(f"{count} ingresses for {first}-{last} in {time.perf_counter() - start:.2f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_build())
@@ -0,0 +1,203 @@
+# Headless frame export for the astrological clock.
+#
+# Renders AstrologicalClock at given timestamps and resolutions under SDL's
+# dummy video driver, through the same update()/draw() path as the window,
+# and writes a PNG sequence or streams raw RGB frames for an encoder.
+#
+#   python export.py --start 2024-01-01T07:44 --duration 10 --out frames/
+#   python export.py --at 2024-03-21T12:00 --at 2024-06-21T12:00 --size 2160x2160 --out refs/
+#   python export.py --start 2024-01-01T00:00 --duration 60 --speed 1440 --format raw \
+#       | ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x800 -r 60 -i - loop.mp4
+#
+# Frames are split into chunks across a process pool. Each worker keeps one
+# clock with its caches warm between chunks and fast-forwards the animation
+# (update() without drawing) over frames rendered by other workers, so the
+# output is the same whatever the worker count.
+import os
+import sys
+import time
+import argparse
+import datetime
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# main before pygame: it keeps pygame's banner out of the raw frames on stdout
+import main
+import pygame
+
+# Raw frames come back to the parent in memory: each chunk is kept under this
+# size, and at most IN_FLIGHT chunks per worker are submitted at a time
+RAW_CHUNK_BYTES = 64 * 1024 * 1024
+IN_FLIGHT = 2
+
+class ExportOptions:
+    def __init__(self, size=(main.WIDTH, main.HEIGHT), fps=60, start=None, speed=1.0, times=None,
+                 image_format="png", out_dir="frames", particle_count=12, highlight=("Leo",), sign_mode="hour",
+                 theme=None):
+        self.size = size
+        self.fps = fps
+        self.start = start or datetime.datetime.now().replace(microsecond=0)
+        self.speed = speed
+        # Explicit timestamps, one per frame, instead of a range from start
+        self.times = times
+        self.image_format = image_format
+        self.out_dir = out_dir
+        self.particle_count = particle_count
+        self.highlight = highlight
+        self.sign_mode = sign_mode
+        # Theme file, loaded once per worker before its clock is built
+        self.theme = theme
+
+    def frame_time(self, index):
+        if self.times is not None:
+            return self.times[index]
+        return self.start + datetime.timedelta(seconds=index * self.speed / self.fps)
+
+    def frame_path(self, index):
+        return os.path.join(self.out_dir, f"frame_{index:06d}.png")
+
+# One clock rendering frames in order. Frames are 1/fps apart in animation
+# time; the clock time for each comes from the options.
+class ExportWorker:
+    def __init__(self, options):
+        self.options = options
+        self.reset()
+
+    def reset(self):
+        options = self.options
+        self.source = main.ManualClock()
+        engine = main.TimeEngine(self.source, start=options.frame_time(0))
+        self.clock = main.AstrologicalClock(particle_count=options.particle_count, time_engine=engine,
+                                            highlight=options.highlight,
+                                            layout=main.ClockLayout((0, 0, *options.size)),
+                                            show_controls=False, sign_mode=options.sign_mode)
+        # Exported frames always show the real zodiac images
+        self.clock.asset_loader.wait()
+        self.surface = pygame.Surface(options.size)
+        self.next_frame = 0
+
+    def step(self, index, draw):
+        self.clock.time_engine.set_time(self.options.frame_time(index))
+        self.clock.update((-1, -1))
+        if draw:
+            self.clock.draw(self.surface)
+        self.source.advance(1 / self.options.fps)
+        self.next_frame = index + 1
+
+    def render(self, first, count):
+        # Returns (pid, frame count, render seconds, raw frames or [])
+        if first < self.next_frame:
+            self.reset()
+        while self.next_frame < first:
+            self.step(self.next_frame, False)
+
+        start = time.perf_counter()
+        frames = []
+        for index in range(first, first + count):
+            self.step(index, True)
+            if self.options.image_format == "png":
+                pygame.image.save(self.surface, self.options.frame_path(index))
+            else:
+                frames.append(pygame.image.tobytes(self.surface, "RGB"))
+        return os.getpid(), count, time.perf_counter() - start, frames
+
+# Per-process worker for the pool
+worker = None
+
+def init_worker(options):
+    global worker
+    main.app.init_display(options.size, headless=True)
+    main.app.load_theme(options.theme)
+    worker = ExportWorker(options)
+
+def render_chunk(first, count):
+    return worker.render(first, count)
+
+def default_chunk_size(options):
+    if options.image_format == "png":
+        return 60
+    width, height = options.size
+    return max(1, RAW_CHUNK_BYTES // (width * height * 3))
+
+def export(options, frame_count, workers=1, chunk_size=None, output=None):
+    # Renders frames 0..frame_count-1; raw frames are written to `output` in
+    # order. Returns {pid: [frames, seconds]} render statistics.
+    if options.image_format == "png":
+        os.makedirs(options.out_dir, exist_ok=True)
+    chunk_size = chunk_size or default_chunk_size(options)
+    chunks = [(first, min(chunk_size, frame_count - first)) for first in range(0, frame_count, chunk_size)]
+    stats = {}
+
+    def collect(result):
+        pid, count, seconds, frames = result
+        totals = stats.setdefault(pid, [0, 0.0])
+        totals[0] += count
+        totals[1] += seconds
+        for frame in frames:
+            output.write(frame)
+
+    if workers <= 1:
+        init_worker(options)
+        for first, count in chunks:
+            collect(render_chunk(first, count))
+        return stats
+
+    # Spawned, not forked: every worker imports main and opens its own
+    # dummy display instead of inheriting the parent's SDL state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=init_worker, initargs=(options,)) as pool:
+        # Submitted in order through a bounded window, so finished raw chunks
+        # can't pile up in memory behind a slow one or a slow reader
+        pending = collections.deque()
+        for first, count in chunks:
+            if len(pending) >= workers * IN_FLIGHT:
+                collect(pending.popleft().result())
+            pending.append(pool.submit(render_chunk, first, count))
+        while pending:
+            collect(pending.popleft().result())
+    return stats
+
+def main_export():
+    parser = argparse.ArgumentParser(description="Headless astrological clock frame export")
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat,
+                        help="clock time of the first frame (ISO format, default now)")
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds of output to render")
+    parser.add_argument("--at", action="append", type=datetime.datetime.fromisoformat, metavar="TIME",
+                        help="render a single frame at TIME instead of a range (repeatable)")
+    parser.add_argument("--fps", type=int, default=60, help="output frame rate")
+    parser.add_argument("--speed", type=float, default=1.0, help="clock seconds per output second")
+    parser.add_argument("--size", type=main.parse_size, default=(main.WIDTH, main.HEIGHT), help="frame size, e.g. 1920x1080")
+    parser.add_argument("--format", choices=("png", "raw"), default="png",
+                        help="PNG sequence in --out, or raw RGB24 frames on stdout")
+    parser.add_argument("--out", default="frames", help="directory for the PNG sequence")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="rendering processes")
+    parser.add_argument("--chunk", type=int,
+                        help="frames per work item (default 60, or up to 64 MiB of frames for raw)")
+    parser.add_argument("--particles", type=main.non_negative_int, default=12, help="central decoration particle count")
+    parser.add_argument("--highlight", default="Leo", help="comma-separated signs the hour hand highlights, or 'all'")
+    parser.add_argument("--signs", choices=main.SIGN_MODES, default="hour",
+                        help="highlight the sign under the hour hand, the Sun's sign, or the Sun's and the Moon's")
+    parser.add_argument("--theme", metavar="PATH", default="theme.json",
+                        help="colors, radii, font and zodiac images (built-in defaults if the file is missing)")
+    args = parser.parse_args()
+
+    options = ExportOptions(size=args.size, fps=args.fps, start=args.start, speed=args.speed, times=args.at,
+                            image_format=args.format, out_dir=args.out, particle_count=args.particles,
+                            highlight=None if args.highlight == "all" else args.highlight.split(","),
+                            sign_mode=args.signs, theme=args.theme)
+    frame_count = len(args.at) if args.at else max(1, round(args.duration * args.fps))
+
+    # stdout may carry the frames, so the report goes to stderr
+    start = time.perf_counter()
+    stats = export(options, frame_count, args.workers, args.chunk,
+                   output=sys.stdout.buffer if args.format == "raw" else None)
+    elapsed = time.perf_counter() - start
+    for pid, (frames, seconds) in sorted(stats.items()):
+        print(f"worker {pid}: {frames} frames in {seconds:.2f} s -> {frames / seconds:.1f} FPS", file=sys.stderr)
+    print(f"total: {frame_count} frames in {elapsed:.2f} s -> {frame_count / elapsed:.1f} FPS"
+          f" with {len(stats)} worker(s)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_export())
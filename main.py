@@ -1,15 +1,38 @@
+import time
+import os
+
+# Start of the import, for the startup report
+import_started = time.perf_counter()
+
+# Keeps pygame's banner off stdout, where export.py --format raw writes frames
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
 import pygame
 import sys
+import argparse
 import math
 import datetime
 import re
-import os
+import csv
+import json
+import hashlib
+import gzip
+import zlib
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from pygame import gfxdraw
 
-pygame.init()
+import ephemeris
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 WIDTH, HEIGHT = 800, 800
-CENTER = (WIDTH // 2, HEIGHT // 2)
 CLOCK_RADIUS = 350
 ZODIAC_RADIUS = 200
 HOUR_FLAME_RADIUS = 300
@@ -17,46 +40,329 @@ HOUR_FLAME_RADIUS = 300
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 GOLD = (255, 215, 0)
+MOON_COLOR = (200, 210, 230)
 FLAME_ON = (90, 180, 255)   
 FLAME_OFF = (40, 75, 102)   
 TRANSPARENT = (0, 0, 0, 0)
 BUTTON_COLOR = (20, 20, 40)
 BUTTON_HOVER = (40, 40, 80)
 
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Astrological Clock")
-clock = pygame.time.Clock()
+# Colors, radii, font and zodiac image paths, read from a JSON theme file on
+# top of the built-in defaults above. A Theme is never modified: a reload
+# makes a new one, LayoutRebuilder rebuilds in the background whatever the
+# differences invalidate, and app.theme is swapped at a frame boundary.
+#
+#   {"colors": {"gold": [255, 215, 0], "flame_on": [90, 180, 255]},
+#    "radii": {"zodiac": 210}, "font": "assets/fonts/gothic.ttf",
+#    "zodiac": {"Leo": "assets/zodiac/leo_alt.png"}}
+class Theme:
+    DEFAULT_COLORS = {
+        "black": BLACK,
+        "white": WHITE,
+        "gold": GOLD,
+        "moon": MOON_COLOR,
+        "flame_on": FLAME_ON,
+        "flame_off": FLAME_OFF,
+        "button": BUTTON_COLOR,
+        "button_hover": BUTTON_HOVER,
+    }
+    DEFAULT_RADII = {"clock": CLOCK_RADIUS, "zodiac": ZODIAC_RADIUS, "hour_flame": HOUR_FLAME_RADIUS}
+    DEFAULT_FONT = "assets/fonts/gothic.ttf"
+    
+    def __init__(self, values=None, path=None):
+        values = values or {}
+        if not isinstance(values, dict):
+            raise ValueError("a theme is a JSON object")
+        self.path = path
+        for name in ("colors", "radii", "zodiac"):
+            if not isinstance(values.get(name, {}), dict):
+                raise ValueError(f"{name!r} must be a JSON object")
+        
+        colors = dict(self.DEFAULT_COLORS, **values.get("colors", {}))
+        for name, color in colors.items():
+            if name not in self.DEFAULT_COLORS:
+                raise ValueError(f"unknown color {name!r}")
+            if (not isinstance(color, (list, tuple)) or len(color) != 3
+                    or not all(isinstance(c, int) and 0 <= c <= 255 for c in color)):
+                raise ValueError(f"color {name!r} must be [r, g, b] with components 0-255")
+            setattr(self, name, tuple(color))
+        
+        radii = dict(self.DEFAULT_RADII, **values.get("radii", {}))
+        for name, radius in radii.items():
+            if name not in self.DEFAULT_RADII:
+                raise ValueError(f"unknown radius {name!r}")
+            if not isinstance(radius, (int, float)) or radius <= 0:
+                raise ValueError(f"radius {name!r} must be a positive number")
+        self.clock_radius = radii["clock"]
+        self.zodiac_radius = radii["zodiac"]
+        self.hour_flame_radius = radii["hour_flame"]
+        
+        self.font_path = values.get("font", self.DEFAULT_FONT)
+        if not isinstance(self.font_path, str):
+            raise ValueError("'font' must be a path")
+        # Image path by sign name; signs not listed keep their default image
+        self.zodiac = dict(values.get("zodiac", {}))
+        for name, image_path in self.zodiac.items():
+            if not isinstance(image_path, str):
+                raise ValueError(f"zodiac image for {name!r} must be a path")
+    
+    @classmethod
+    def load(cls, path):
+        # Raises OSError or ValueError for a missing or malformed file
+        with open(path) as f:
+            return cls(json.load(f), path)
+    
+    def changes(self, other):
+        # What switching from this theme to `other` invalidates
+        changed = set()
+        if (self.black, self.white) != (other.black, other.white):
+            changed.add("face")
+        if (self.white, self.gold) != (other.white, other.gold):
+            changed.add("hands")
+        if (self.flame_on, self.flame_off) != (other.flame_on, other.flame_off):
+            changed.add("flames")
+        if self.font_path != other.font_path:
+            changed.add("fonts")
+        if (self.font_path != other.font_path
+                or (self.clock_radius, self.zodiac_radius, self.hour_flame_radius)
+                != (other.clock_radius, other.zodiac_radius, other.hour_flame_radius)):
+            changed.add("layout")
+        if self.zodiac != other.zodiac:
+            changed.add("zodiac")
+        return changed
 
-try:
-    font_large = pygame.font.Font("assets/fonts/gothic.ttf", 36)
-    font_small = pygame.font.Font("assets/fonts/gothic.ttf", 24)
-    font_tiny = pygame.font.Font("assets/fonts/gothic.ttf", 18)
-except:
-    font_large = pygame.font.SysFont("serif", 36)
-    font_small = pygame.font.SysFont("serif", 24)
-    font_tiny = pygame.font.SysFont("serif", 18)
+# Application context. Importing this module initializes nothing: pygame
+# subsystems come up on demand, the font module the first time text is
+# rendered and the display only when a window is opened, so tools and
+# workers that just need the logic or offscreen rendering skip the rest.
+# Every startup phase is timed for the startup report.
+class App:
+    def __init__(self, started):
+        self.started = started
+        self.phases = OrderedDict()
+        self.screen = None
+        self.clock = None
+        self.vsync = False
+        self.theme = Theme()
+    
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+    
+    def init_fonts(self):
+        if not pygame.font.get_init():
+            with self.phase("font-init"):
+                pygame.font.init()
+    
+    def load_theme(self, path):
+        # The theme file if there is one, else the built-in defaults
+        if path and os.path.exists(path):
+            with self.phase("theme"):
+                try:
+                    self.theme = Theme.load(path)
+                except (OSError, ValueError) as e:
+                    print(f"theme {path}: {e}; using the defaults", file=sys.stderr)
+        return self.theme
+    
+    def init_display(self, size=(WIDTH, HEIGHT), flags=0, vsync=False, headless=False):
+        # headless: SDL's dummy drivers for the tools and export workers. There
+        # is no window, but there is a display surface, so layers are still
+        # converted to the display format as they are in the window.
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        with self.phase("display"):
+            pygame.display.init()
+            self.screen = None
+            if vsync:
+                # Only a request; drivers are free to ignore it
+                try:
+                    self.screen = pygame.display.set_mode(size, flags, vsync=1)
+                    self.vsync = True
+                except pygame.error:
+                    pass
+            if self.screen is None:
+                self.screen = pygame.display.set_mode(size, flags)
+            pygame.display.set_caption("Reloj Astrológico Interactivo")
+            if self.clock is None:
+                self.clock = pygame.time.Clock()
+        return self.screen
+    
+    def first_frame(self):
+        # Call after every present; True the first time
+        if "time-to-first-frame" in self.phases:
+            return False
+        self.phases["time-to-first-frame"] = time.perf_counter() - self.started
+        return True
+    
+    def report(self):
+        return {name: seconds * 1000 for name, seconds in self.phases.items()}
+    
+    def refresh_rate(self, default=60):
+        # The display's refresh rate where pygame can tell, else `default`
+        rates = getattr(pygame.display, "get_desktop_refresh_rates", None)
+        if rates is not None:
+            try:
+                rate = rates()[0]
+            except (pygame.error, IndexError):
+                rate = 0
+            if rate > 0:
+                return rate
+        return default
+
+app = App(import_started)
+
+def load_font(size, path):
+    app.init_fonts()
+    with app.phase("fonts"):
+        try:
+            return pygame.font.Font(path, size)
+        except:
+            return pygame.font.SysFont("serif", size)
+
+# Fonts by file and point size, loaded on first use and shared by every clock
+# drawn at the same scale
+fonts = {}
+
+def font_at(size, scale=1.0, theme=None):
+    size = max(1, round(size * scale))
+    path = (theme or app.theme).font_path
+    font = fonts.get((path, size))
+    if font is None:
+        font = fonts[(path, size)] = load_font(size, path)
+    return font
+
+def drop_fonts(keep_path):
+    # After a font change: forget the other files' fonts and their text
+    dropped = {font for (path, _), font in fonts.items() if path != keep_path}
+    for key in [key for key in fonts if key[0] != keep_path]:
+        del fonts[key]
+    text_cache.discard_fonts(dropped)
+
+# Shared LRU cache of rendered text surfaces. Rasterizing glyphs is one of the
+# most expensive things done per frame and most labels never change.
+class TextCache:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        
+        self.misses += 1
+        surface = counted(font.render(text, antialias, color))
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    def preload(self, surfaces):
+        # Entries rendered ahead of time, e.g. off the render thread
+        for key, surface in surfaces.items():
+            self.surfaces[key] = surface
+            self.surfaces.move_to_end(key)
+        while len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+    
+    def discard_fonts(self, dropped):
+        for key in [key for key in self.surfaces if key[0] in dropped]:
+            del self.surfaces[key]
+
+text_cache = TextCache()
+
+# Every Surface the renderer creates goes through here so the profiler can
+# count allocations per frame: new ones from new_surface(), and ones pygame
+# makes (text, convert, transforms, subsurfaces) through counted()
+surface_allocations = 0
+
+def counted(surface):
+    global surface_allocations
+    surface_allocations += 1
+    return surface
+
+def new_surface(size, flags=0):
+    return counted(pygame.Surface(size, flags))
+
+# Reusable scratch surfaces for per-frame effects that are drawn and blitted
+# straight away (the sign highlight glow). A scratch surface is cleared and
+# handed out again on the next request with the same size and flags.
+class SurfacePool:
+    def __init__(self):
+        self.surfaces = {}
+    
+    def scratch(self, size, flags=0):
+        key = (tuple(size), flags)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = new_surface(size, flags)
+        else:
+            surface.fill(TRANSPARENT if flags & pygame.SRCALPHA else app.theme.black)
+        return surface
+    
+    def clear(self):
+        self.surfaces.clear()
+
+surface_pool = SurfacePool()
+
+# Where a clock is drawn and at what size. The original 800x800 window is
+# scale 1; any other rect gets the same clock scaled to fit and centered, and
+# every radius, font and sprite size is derived from that scale. Radii and
+# fonts come from the theme.
+class ClockLayout:
+    def __init__(self, rect=(0, 0, WIDTH, HEIGHT), theme=None):
+        theme = theme or app.theme
+        self.rect = pygame.Rect(rect)
+        self.scale = min(self.rect.width / WIDTH, self.rect.height / HEIGHT)
+        self.center = self.rect.center
+        # Center relative to the rect, for surfaces the size of the rect
+        self.local_center = (self.center[0] - self.rect.x, self.center[1] - self.rect.y)
+        self.clock_radius = self.scaled(theme.clock_radius)
+        self.zodiac_radius = self.scaled(theme.zodiac_radius)
+        self.hour_flame_radius = self.scaled(theme.hour_flame_radius)
+        self.font_large = font_at(36, self.scale, theme)
+        self.font_small = font_at(24, self.scale, theme)
+        self.font_tiny = font_at(18, self.scale, theme)
+    
+    def scaled(self, value):
+        # Lengths never shrink to nothing, so thin lines stay visible
+        return max(1, round(value * self.scale))
 
 # Implementación de lista doblemente enlazada circular para los signos zodiacales
 class ZodiacSign:
     def __init__(self, name, image_path, angle):
         self.name = name
-        self.image = None
-        self.image_path = image_path
+        self.image = None  # Placeholder until ZodiacAssetLoader swaps the real image in
+        self.placeholder = True
+        self.image_path = image_path  # Default; a theme can point elsewhere
         self.angle = angle
         # Referencias para la lista doblemente enlazada
         self.prev = None  # Referencia al nodo anterior
         self.next = None  # Referencia al nodo siguiente
-        
-        try:
-            self.image = pygame.image.load(image_path)
-            self.image = pygame.transform.scale(self.image, (50, 50))
-        except:
+    
+    def current_image(self):
+        # The placeholder is only drawn once something renders the sign
+        if self.image is None:
             self.image = self.create_placeholder_image()
+        return self.image
     
-    def create_placeholder_image(self):
-        surface = pygame.Surface((50, 50), pygame.SRCALPHA)
-        pygame.draw.circle(surface, WHITE, (25, 25), 20, 2)
-        text = font_small.render(self.name[:3], True, WHITE)
+    def create_placeholder_image(self, theme=None):
+        theme = theme or app.theme
+        surface = new_surface((50, 50), pygame.SRCALPHA)
+        pygame.draw.circle(surface, theme.white, (25, 25), 20, 2)
+        # Not through the text cache: placeholders are also drawn off the
+        # render thread for a new theme
+        text = counted(font_at(24, theme=theme).render(self.name[:3], True, theme.white))
         text_rect = text.get_rect(center=(25, 25))
         surface.blit(text, text_rect)
         return surface
@@ -103,67 +409,332 @@ def create_zodiac_wheel():
     
     return first_sign
 
-# Flame class for the hour indicators
-class Flame:
-    def __init__(self, hour, radius):
-        self.hour = hour
-        self.radius = radius
-        self.angle = (hour * 30) - 90  # Convert hour to angle (0 at 3 o'clock, -90 to adjust)
-        self.is_on = True
-        self.alpha = 255
-        self.fade_direction = 1
-        self.glow_intensity = 0
-        self.glow_direction = 1
+# Index kept alongside the circular linked list: signs by position on the
+# wheel and by 30-degree angle bucket, with screen positions cached per
+# center and radius. The hour hand highlights a sign while it is within
+# HIGHLIGHT_HALF_WIDTH degrees of the sign's angle plus HIGHLIGHT_OFFSET
+# (for Leo, the original 142-158 window).
+class ZodiacIndex:
+    HIGHLIGHT_OFFSET = 30
+    HIGHLIGHT_HALF_WIDTH = 8
     
-    def update(self, current_hour):
-        # Update flame state based on current hour
-        self.is_on = self.hour >= current_hour
-        
-        # Update glow animation effect
-        self.glow_intensity += self.glow_direction * 2
-        if self.glow_intensity >= 50 or self.glow_intensity <= 0:
-            self.glow_direction *= -1
+    def __init__(self, zodiac_wheel, highlight=("Leo",)):
+        self.by_position = []
+        sign = zodiac_wheel
+        while True:
+            self.by_position.append(sign)
+            sign = sign.next
+            if sign is zodiac_wheel:
+                break
+        self.buckets = [None] * 12
+        for sign in self.by_position:
+            self.buckets[int(sign.angle % 360 // 30)] = sign
+        # None highlights every sign
+        self.highlight = None if highlight is None else set(highlight)
+        self.placements = {}
+        # Bumped whenever sign images change, so faces built from them rebuild
+        self.version = 0
+        self.scaled_images = {}
+    
+    def __iter__(self):
+        return iter(self.by_position)
+    
+    def place(self, center, radius):
+        # Screen position of each sign, computed once per center and radius
+        key = (center, radius)
+        positions = self.placements.get(key)
+        if positions is None:
+            positions = self.placements[key] = {}
+            for sign in self.by_position:
+                angle_rad = math.radians(sign.angle - 90)  # Adjust to start from top
+                positions[sign] = (center[0] + radius * math.cos(angle_rad),
+                                   center[1] + radius * math.sin(angle_rad))
+        return positions
+    
+    def image(self, sign, size):
+        # Sign image at another size, scaled once per size and source image
+        image = sign.current_image()
+        if image.get_size() == size:
+            return image
+        scaled = self.scaled_images.get((sign, size))
+        if scaled is None or scaled[0] is not image:
+            scaled = self.scaled_images[(sign, size)] = (image, counted(pygame.transform.smoothscale(image, size)))
+        return scaled[1]
+    
+    def drop_unused(self, layouts):
+        # Forget placements and scaled images no layout uses any more
+        radii = {layout.zodiac_radius for layout in layouts}
+        sizes = {(layout.scaled(50), layout.scaled(50)) for layout in layouts}
+        for key in [key for key in self.placements if key[1] not in radii]:
+            del self.placements[key]
+        for key in [key for key in self.scaled_images if key[1] not in sizes]:
+            del self.scaled_images[key]
+    
+    def highlighted_sign(self, hour_angle):
+        relative = (hour_angle - self.HIGHLIGHT_OFFSET) % 360
+        sign = self.buckets[int((relative + 15) // 30) % 12]
+        if sign is None or (self.highlight is not None and sign.name not in self.highlight):
+            return None
+        distance = abs((relative - sign.angle + 180) % 360 - 180)
+        return sign if distance <= self.HIGHLIGHT_HALF_WIDTH else None
+
+# Loads, scales and packs the twelve zodiac images off the render thread.
+# The packed atlas is cached on disk, keyed by the source files' mtimes and
+# the target size, so later starts need a single image load. Signs keep
+# their placeholders until poll() swaps the real images in. Only the
+# `keep_cached` most recently used atlases stay on disk.
+class ZodiacAssetLoader:
+    def __init__(self, zodiac_index, size=(50, 50), cache_dir="assets/cache", max_workers=4, theme=None,
+                 keep_cached=4):
+        self.zodiac_index = zodiac_index
+        self.signs = list(zodiac_index)
+        theme = theme or app.theme
+        self.paths = [theme.zodiac.get(sign.name, sign.image_path) for sign in self.signs]
+        self.size = size
+        self.cache_dir = cache_dir
+        self.keep_cached = keep_cached
+        self.max_workers = max_workers
+        self.thread = None
+        self.done = threading.Event()
+        self.result = None
+        self.applied = False
+    
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="zodiac-assets", daemon=True)
+        self.thread.start()
+    
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+    
+    def cache_path(self):
+        key = [self.size]
+        for path in self.paths:
+            try:
+                key.append((path, os.stat(path).st_mtime_ns))
+            except OSError:
+                key.append((path, None))
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"zodiac_{self.size[0]}x{self.size[1]}_{digest}.png")
+    
+    def prune_cache(self):
+        # Atlases for window sizes no longer in use, oldest first
+        try:
+            names = [name for name in os.listdir(self.cache_dir)
+                     if name.startswith("zodiac_") and name.endswith(".png")]
+            paths = sorted((os.path.join(self.cache_dir, name) for name in names), key=os.path.getmtime)
+            for path in paths[:-self.keep_cached]:
+                os.remove(path)
+        except OSError:
+            pass
+    
+    def load_image(self, path):
+        try:
+            return counted(pygame.transform.scale(counted(pygame.image.load(path)), self.size))
+        except:
+            return None
+    
+    def run(self):
+        try:
+            path = self.cache_path()
+            if os.path.exists(path):
+                atlas = counted(pygame.image.load(path))
+                # The mtime tracks use, for prune_cache()
+                os.utime(path)
+                self.result = (atlas, [True] * len(self.signs))
+                return
+            
+            with ThreadPoolExecutor(self.max_workers) as pool:
+                images = list(pool.map(self.load_image, self.paths))
+            if not any(images):
+                return
+            
+            width, height = self.size
+            atlas = new_surface((width * len(images), height), pygame.SRCALPHA)
+            for i, image in enumerate(images):
+                if image is not None:
+                    atlas.blit(image, (i * width, 0))
+            
+            # Only complete sets are cached; a missing file keeps its placeholder
+            if all(images):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                pygame.image.save(atlas, path)
+                self.prune_cache()
+            self.result = (atlas, [image is not None for image in images])
+        except:
+            self.result = None
+        finally:
+            self.done.set()
+    
+    def images(self):
+        # The loaded images by sign, before poll() swaps them in
+        if self.result is None:
+            return {}
+        atlas, loaded = self.result
+        width, height = self.size
+        return {sign: counted(atlas.subsurface((i * width, 0, width, height)))
+                for i, sign in enumerate(self.signs) if loaded[i]}
+    
+    def poll(self):
+        # Called on the main thread; returns True once when the images change
+        if self.applied or not self.done.is_set():
+            return False
+        self.applied = True
+        if self.result is None:
+            return False
         
-        # Update alpha for fade effect
-        if self.is_on:
-            self.alpha += self.fade_direction * 3
-            if self.alpha >= 255 or self.alpha <= 180:
-                self.fade_direction *= -1
+        atlas, loaded = self.result
+        if pygame.display.get_surface() is not None:
+            atlas = counted(atlas.convert_alpha())
+        width, height = self.size
+        for i, sign in enumerate(self.signs):
+            if loaded[i]:
+                sign.image = counted(atlas.subsurface((i * width, 0, width, height)))
+                sign.placeholder = False
+        self.zodiac_index.version += 1
+        return True
+
+ROMAN_NUMERALS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
+
+# Pre-rendered flame sprites. A flame is either off, or on with one of the 26
+# glow steps its animation cycles through (0..50 in steps of 2), so every
+# state is baked once into a single atlas surface and drawn with one blit.
+# There is one atlas per scale, shared by every clock drawn at that scale.
+class FlameAtlas:
+    CELL_SIZE = (42, 93)  # Tight around the tallest flame and its glow
+    ANCHOR = (21, 91)  # Flame base inside a cell
+    GLOW_STEPS = 26
+    
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.cell_size = (max(1, round(self.CELL_SIZE[0] * scale)), max(1, round(self.CELL_SIZE[1] * scale)))
+        self.anchor = (round(self.ANCHOR[0] * scale), round(self.ANCHOR[1] * scale))
+        self.surface = None
+        self.key = None
+        self.areas = []
+    
+    def get(self):
+        theme = app.theme
+        if (theme.flame_on, theme.flame_off) != self.key:
+            self.build(theme)
+        return self.surface
+    
+    def area(self, is_on, glow_intensity):
+        # The last cell holds the unlit flame
+        if not is_on:
+            return self.areas[self.GLOW_STEPS]
+        step = min(max(int(glow_intensity) // 2, 0), self.GLOW_STEPS - 1)
+        return self.areas[step]
     
-    def draw(self, surface):
-        x = CENTER[0] + self.radius * math.cos(math.radians(self.angle))
-        y = CENTER[1] + self.radius * math.sin(math.radians(self.angle))
+    def build(self, theme=None):
+        theme = theme or app.theme
+        width, height = self.cell_size
+        atlas = new_surface((width * (self.GLOW_STEPS + 1), height), pygame.SRCALPHA)
+        # Not a pool scratch surface: atlases for a new layout are built off
+        # the render thread
+        glow_surface = new_surface(self.cell_size, pygame.SRCALPHA)
+        areas = []
+        for index in range(self.GLOW_STEPS + 1):
+            area = pygame.Rect(index * width, 0, width, height)
+            is_on = index < self.GLOW_STEPS
+            self.draw_flame(counted(atlas.subsurface(area)), glow_surface, theme.flame_on if is_on else theme.flame_off,
+                            is_on, index * 2 if is_on else 0)
+            areas.append(area)
         
-        # Draw flame shape
-        color = FLAME_ON if self.is_on else FLAME_OFF
+        if pygame.display.get_surface() is not None:
+            atlas = counted(atlas.convert_alpha())
+        self.areas = areas
+        self.surface = atlas
+        self.key = (theme.flame_on, theme.flame_off)
+        return self
+    
+    def draw_flame(self, surface, glow_surface, color, is_on, glow_intensity):
+        x, y = self.anchor
+        s = self.scale
         
         # Create flame shape points
         flame_points = [
             (x, y),
-            (x - 20, y - 15),
-            (x, y - 40 - (self.glow_intensity if self.is_on else 0)),
-            (x + 20, y - 15)
+            (x - 20 * s, y - 15 * s),
+            (x, y - (40 + (glow_intensity if is_on else 0)) * s),
+            (x + 20 * s, y - 15 * s)
         ]
         
         # Draw main flame
         pygame.draw.polygon(surface, color, flame_points)
         
         # Draw glow effect for active flames
-        if self.is_on:
-            glow_surface = pygame.Surface((100, 100), pygame.SRCALPHA)
+        if is_on:
+            glow_surface.fill(TRANSPARENT)
             pygame.draw.polygon(glow_surface, (*color[:3], 100), [
-                (50, 50),
-                (30, 35),
-                (50, 10 - self.glow_intensity // 2),
-                (70, 35)
+                (x, y),
+                (x - 20 * s, y - 15 * s),
+                (x, y - (40 + glow_intensity // 2) * s),
+                (x + 20 * s, y - 15 * s)
             ])
-            surface.blit(glow_surface, (x - 50, y - 50))
+            surface.blit(glow_surface, (0, 0))
+
+flame_atlases = {}
+
+def flame_atlas_at(scale):
+    atlas = flame_atlases.get(scale)
+    if atlas is None:
+        atlas = flame_atlases[scale] = FlameAtlas(scale)
+    return atlas
+
+# Flame class for the hour indicators
+class Flame:
+    def __init__(self, hour, layout):
+        self.hour = hour
+        self.angle = (hour * 30) - 90  # Convert hour to angle (0 at 3 o'clock, -90 to adjust)
+        self.is_on = True
+        self.alpha = 255
+        self.fade_direction = 1
+        self.glow_intensity = 0
+        self.glow_direction = 1
+        self.place(layout)
+    
+    def place(self, layout):
+        self.radius = layout.hour_flame_radius
+        self.atlas = flame_atlas_at(layout.scale)
+        self.font = layout.font_large
         
-        # Draw the hour number (Roman numeral)
-        roman_numerals = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
-        num_text = font_large.render(roman_numerals[self.hour - 1], True, WHITE)
-        text_rect = num_text.get_rect(center=(x, y))
-        surface.blit(num_text, text_rect)
+        # Fixed screen anchors: flame base and top-left of its atlas sprite
+        self.x = layout.center[0] + self.radius * math.cos(math.radians(self.angle))
+        self.y = layout.center[1] + self.radius * math.sin(math.radians(self.angle))
+        self.sprite_pos = (round(self.x) - self.atlas.anchor[0], round(self.y) - self.atlas.anchor[1])
+    
+    def update(self, current_hour, steps=1):
+        # Update flame state based on current hour
+        self.is_on = self.hour >= current_hour
+        
+        # Advance the animation by a number of fixed timesteps
+        for _ in range(steps):
+            # Update glow animation effect
+            self.glow_intensity += self.glow_direction * 2
+            if self.glow_intensity >= 50 or self.glow_intensity <= 0:
+                self.glow_direction *= -1
+            
+            # Update alpha for fade effect
+            if self.is_on:
+                self.alpha += self.fade_direction * 3
+                if self.alpha >= 255 or self.alpha <= 180:
+                    self.fade_direction *= -1
+    
+    def state(self):
+        # What drawing needs of the animation, for a ClockSnapshot
+        return self.is_on, self.glow_intensity
+    
+    def blit_items(self, state=None):
+        # Flame sprite plus the hour number (Roman numeral), ready for Surface.blits
+        is_on, glow_intensity = state or self.state()
+        num_text = text_cache.render(self.font, ROMAN_NUMERALS[self.hour - 1], True, app.theme.white)
+        return [
+            (self.atlas.get(), self.sprite_pos, self.atlas.area(is_on, glow_intensity)),
+            (num_text, num_text.get_rect(center=(self.x, self.y))),
+        ]
+    
+    def draw(self, surface, state=None):
+        return surface.blits(self.blit_items(state))
 
 # Function to validate time input
 def validate_time(time_str):
@@ -172,51 +743,67 @@ def validate_time(time_str):
 
 # Button class for UI interaction
 class Button:
-    def __init__(self, x, y, width, height, text, action=None):
+    def __init__(self, x, y, width, height, text, action=None, font=None):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
+        self.font = font or font_at(24)
         self.action = action
-        self.color = BUTTON_COLOR
-        self.hover_color = BUTTON_HOVER
-        self.text_color = WHITE
         self.is_hovered = False
         self.alpha = 200  # Semi-transparent
         self.clicked = False
+        self.backgrounds = {}  # Pre-rendered backgrounds by color
     
     def update(self, mouse_pos):
         # Check if mouse is hovering over button
         self.is_hovered = self.rect.collidepoint(mouse_pos)
     
-    def draw(self, surface):
+    def draw(self, surface, hovered=None):
         # Draw button with rounded corners
-        color = self.hover_color if self.is_hovered else self.color
+        theme = app.theme
+        if hovered is None:
+            hovered = self.is_hovered
+        color = theme.button_hover if hovered else theme.button
         
-        # Create a surface for the semi-transparent button
-        button_surface = pygame.Surface((self.rect.width, self.rect.height), pygame.SRCALPHA)
-        pygame.draw.rect(button_surface, (*color, self.alpha), (0, 0, self.rect.width, self.rect.height), border_radius=10)
+        # Semi-transparent background, rendered once per color
+        key = (color, self.alpha, self.rect.size)
+        button_surface = self.backgrounds.get(key)
+        if button_surface is None:
+            button_surface = new_surface((self.rect.width, self.rect.height), pygame.SRCALPHA)
+            pygame.draw.rect(button_surface, (*color, self.alpha), (0, 0, self.rect.width, self.rect.height), border_radius=10)
+            self.backgrounds[key] = button_surface
         surface.blit(button_surface, self.rect)
         
         # Draw border
-        pygame.draw.rect(surface, WHITE, self.rect, 1, border_radius=10)
+        pygame.draw.rect(surface, theme.white, self.rect, 1, border_radius=10)
         
         # Draw text
-        text_surface = font_small.render(self.text, True, self.text_color)
+        text_surface = text_cache.render(self.font, self.text, True, theme.white)
         text_rect = text_surface.get_rect(center=self.rect.center)
-        surface.blit(text_surface, text_rect)
+        return [self.rect.union(surface.blit(text_surface, text_rect))]
 
 # Time input modal dialog
 class TimeInputModal:
-    def __init__(self):
+    def __init__(self, layout=None):
         self.visible = False
-        self.width = 400
-        self.height = 200
-        self.rect = pygame.Rect(WIDTH//2 - self.width//2, HEIGHT//2 - self.height//2, self.width, self.height)
         self.text = ''
         self.invalid = False
         self.time_result = None
         self.submitted = False
-        self.close_button = Button(WIDTH//2 + self.width//2 - 30, HEIGHT//2 - self.height//2 + 10, 20, 20, "✕")
-        self.submit_button = Button(WIDTH//2 - 50, HEIGHT//2 + self.height//2 - 50, 100, 30, "Aplicar")
+        self.overlay = None
+        self.place(layout or ClockLayout())
+    
+    def place(self, layout):
+        # Centered on the clock, scaled with it
+        self.layout = layout
+        s = layout.scaled
+        center_x, center_y = layout.center
+        self.width = s(400)
+        self.height = s(200)
+        self.rect = pygame.Rect(center_x - self.width//2, center_y - self.height//2, self.width, self.height)
+        self.close_button = Button(center_x + self.width//2 - s(30), center_y - self.height//2 + s(10),
+                                   s(20), s(20), "✕", font=layout.font_small)
+        self.submit_button = Button(center_x - s(50), center_y + self.height//2 - s(50), s(100), s(30), "Aplicar",
+                                    font=layout.font_small)
     
     def toggle_visibility(self):
         self.visible = not self.visible
@@ -271,51 +858,65 @@ class TimeInputModal:
             self.close_button.update(mouse_pos)
             self.submit_button.update(mouse_pos)
     
-    def draw(self, surface):
-        if not self.visible:
-            return
+    def state(self):
+        # (visible, text, invalid, close hovered, submit hovered), for a ClockSnapshot
+        return self.visible, self.text, self.invalid, self.close_button.is_hovered, self.submit_button.is_hovered
+    
+    def draw(self, surface, state=None):
+        visible, text, invalid, close_hovered, submit_hovered = state or self.state()
+        if not visible:
+            return []
+        
+        # Draw semi-transparent overlay, kept between frames
+        if self.overlay is None or self.overlay.get_size() != surface.get_size():
+            self.overlay = new_surface(surface.get_size(), pygame.SRCALPHA)
+            self.overlay.fill((0, 0, 0, 180))
+        surface.blit(self.overlay, (0, 0))
         
-        # Draw semi-transparent overlay
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        surface.blit(overlay, (0, 0))
+        layout = self.layout
+        s = layout.scaled
+        center_x, center_y = layout.center
+        white = app.theme.white
         
         # Draw modal background
-        pygame.draw.rect(surface, (20, 20, 30), self.rect, border_radius=15)
-        pygame.draw.rect(surface, WHITE, self.rect, 2, border_radius=15)
+        pygame.draw.rect(surface, (20, 20, 30), self.rect, border_radius=s(15))
+        pygame.draw.rect(surface, white, self.rect, s(2), border_radius=s(15))
         
         # Draw title
-        title_text = font_large.render("Cambiar Hora", True, WHITE)
-        title_rect = title_text.get_rect(center=(WIDTH//2, HEIGHT//2 - self.height//2 + 30))
+        title_text = text_cache.render(layout.font_large, "Cambiar Hora", True, white)
+        title_rect = title_text.get_rect(center=(center_x, center_y - self.height//2 + s(30)))
         surface.blit(title_text, title_rect)
         
         # Draw input field
-        input_rect = pygame.Rect(WIDTH//2 - 150, HEIGHT//2 - 20, 300, 40)
-        pygame.draw.rect(surface, (40, 40, 60), input_rect, border_radius=5)
-        pygame.draw.rect(surface, WHITE, input_rect, 2, border_radius=5)
+        input_rect = pygame.Rect(center_x - s(150), center_y - s(20), s(300), s(40))
+        pygame.draw.rect(surface, (40, 40, 60), input_rect, border_radius=s(5))
+        pygame.draw.rect(surface, white, input_rect, s(2), border_radius=s(5))
         
         # Draw input text
-        input_text = font_small.render(self.text, True, WHITE)
+        input_text = text_cache.render(layout.font_small, text, True, white)
         input_text_rect = input_text.get_rect(center=input_rect.center)
         surface.blit(input_text, input_text_rect)
         
         # Draw placeholder text if empty
-        if not self.text:
-            placeholder = font_small.render("HH:MM:SS", True, (150, 150, 150))
+        if not text:
+            placeholder = text_cache.render(layout.font_small, "HH:MM:SS", True, (150, 150, 150))
             placeholder_rect = placeholder.get_rect(center=input_rect.center)
             surface.blit(placeholder, placeholder_rect)
         
         # Draw error message if invalid
-        if self.invalid:
-            error_text = font_tiny.render("⚠️ Formato inválido! Use HH:MM:SS", True, (255, 100, 100))
-            error_rect = error_text.get_rect(center=(WIDTH//2, HEIGHT//2 + 30))
+        if invalid:
+            error_text = text_cache.render(layout.font_tiny, "⚠️ Formato inválido! Use HH:MM:SS", True, (255, 100, 100))
+            error_rect = error_text.get_rect(center=(center_x, center_y + s(30)))
             surface.blit(error_text, error_rect)
         
         # Draw close button
-        self.close_button.draw(surface)
+        self.close_button.draw(surface, close_hovered)
         
         # Draw submit button
-        self.submit_button.draw(surface)
+        self.submit_button.draw(surface, submit_hovered)
+        
+        # The overlay darkens the whole window
+        return [surface.get_rect()]
     
     def get_time(self):
         if self.submitted:
@@ -323,89 +924,617 @@ class TimeInputModal:
             return self.time_result
         return None
 
+# Orbiting particles around the central medallion, stored as a struct of
+# arrays (angle, distance, size, speed, color) so thousands of them can be
+# moved with vectorized NumPy operations. Particles are drawn in batches of
+# pre-rendered circle sprites, one batch per size and color.
 class CentralDecoration:
-    def __init__(self):
+    def __init__(self, particle_count=12, layout=None):
         self.rotation = 0
         self.scale_factor = 1.0
         self.scale_direction = 1
-        self.particles = []
+        self.particle_count = particle_count
         self.generate_particles()
+        self.place(layout or ClockLayout())
     
     def generate_particles(self):
-        self.particles = []
-        for i in range(12):
-            angle = i * 30
-            distance = 50 + (i % 3) * 20
-            self.particles.append({
-                'angle': angle,
-                'distance': distance,
-                'size': 5 + (i % 4),
-                'color': GOLD if i % 3 == 0 else WHITE,
-                'speed': 0.5 + (i % 5) * 0.2
-            })
-    
-    def update(self):
-        self.rotation += 0.2
-        
-        self.scale_factor += 0.005 * self.scale_direction
-        if self.scale_factor > 1.1 or self.scale_factor < 0.9:
-            self.scale_direction *= -1
-        
-        for particle in self.particles:
-            particle['angle'] += particle['speed']
-            if particle['angle'] >= 360:
-                particle['angle'] -= 360
-    
-    def draw(self, surface):
+        count = self.particle_count
+        if np is not None:
+            index = np.arange(count)
+            self.angles = index * (360.0 / max(count, 1))
+            self.speeds = 0.5 + (index % 5) * 0.2
+        else:
+            index = range(count)
+            self.angles = [i * (360.0 / count) for i in index]
+            self.speeds = [0.5 + (i % 5) * 0.2 for i in index]
+        # Theme color names, looked up when drawing
+        self.colors = ["gold" if i % 3 == 0 else "white" for i in range(count)]
+    
+    def place(self, layout):
+        # Distances and sprite sizes follow the layout; the animation state
+        # carries over when the layout changes
+        self.layout = layout
+        self.sprites = {}
+        count = self.particle_count
+        self.distances = [(50 + (i % 3) * 20) * layout.scale for i in range(count)]
+        self.sizes = [layout.scaled(5 + (i % 4)) for i in range(count)]
+        
+        # Group particle indices by sprite so each group is one Surface.blits call
+        groups = {}
+        for i in range(count):
+            groups.setdefault((self.sizes[i], self.colors[i]), []).append(i)
+        self.groups = []
+        for (size, color), members in groups.items():
+            if np is not None:
+                members = np.array(members)
+            self.groups.append((size, color, members))
+        if np is not None:
+            self.distances = np.array(self.distances, dtype=float)
+    
+    def sprite(self, size, color_name):
+        color = getattr(app.theme, color_name)
+        sprite = self.sprites.get((size, color))
+        if sprite is None:
+            sprite = new_surface((size * 2 + 1, size * 2 + 1), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, color, (size, size), size)
+            self.sprites[(size, color)] = sprite
+        return sprite
+    
+    def update(self, steps=1):
+        # Advance the animation by a number of fixed timesteps
+        if steps <= 0:
+            return
+        self.rotation += 0.2 * steps
+        
+        for _ in range(steps):
+            self.scale_factor += 0.005 * self.scale_direction
+            if self.scale_factor > 1.1 or self.scale_factor < 0.9:
+                self.scale_direction *= -1
+        
+        if np is not None:
+            self.angles += self.speeds * steps
+            self.angles %= 360
+        else:
+            self.angles = [(angle + speed * steps) % 360 for angle, speed in zip(self.angles, self.speeds)]
+    
+    def state(self):
+        # (rotation, scale factor, particle angles), for a ClockSnapshot; the
+        # angles are updated in place, so they are copied
+        angles = self.angles.copy() if np is not None else self.angles
+        return self.rotation, self.scale_factor, angles
+    
+    def particle_positions(self, angles, scale_factor):
+        if np is not None:
+            radians = np.radians(angles)
+            distances = self.distances * scale_factor
+            xs = (self.layout.center[0] + distances * np.cos(radians)).astype(int)
+            ys = (self.layout.center[1] + distances * np.sin(radians)).astype(int)
+            return xs, ys
+        
+        xs, ys = [], []
+        center_x, center_y = self.layout.center
+        for angle, distance in zip(angles, self.distances):
+            distance *= scale_factor
+            xs.append(int(center_x + distance * math.cos(math.radians(angle))))
+            ys.append(int(center_y + distance * math.sin(math.radians(angle))))
+        return xs, ys
+    
+    def draw(self, surface, state=None):
+        rotation, scale_factor, angles = state or self.state()
+        layout = self.layout
+        center = layout.center
+        theme = app.theme
+        dirty = []
         for i in range(3):
-            radius = 40 + i * 20
-            pygame.draw.circle(surface, WHITE, CENTER, int(radius * self.scale_factor), 1)
+            radius = (40 + i * 20) * layout.scale
+            dirty.append(pygame.draw.circle(surface, theme.white, center, int(radius * scale_factor), 1))
         
+        orbit = 80 * layout.scale
+        dot = layout.scaled(3)
         for i in range(8):
-            angle = self.rotation + i * 45
-            x = CENTER[0] + 80 * math.cos(math.radians(angle))
-            y = CENTER[1] + 80 * math.sin(math.radians(angle))
-            pygame.draw.circle(surface, GOLD, (int(x), int(y)), 3)
-        
-        for particle in self.particles:
-            angle = particle['angle']
-            distance = particle['distance'] * self.scale_factor
-            x = CENTER[0] + distance * math.cos(math.radians(angle))
-            y = CENTER[1] + distance * math.sin(math.radians(angle))
-            pygame.draw.circle(surface, particle['color'], (int(x), int(y)), particle['size'])
+            angle = rotation + i * 45
+            x = center[0] + orbit * math.cos(math.radians(angle))
+            y = center[1] + orbit * math.sin(math.radians(angle))
+            dirty.append(pygame.draw.circle(surface, theme.gold, (int(x), int(y)), dot))
+        
+        if self.particle_count:
+            xs, ys = self.particle_positions(angles, scale_factor)
+            for size, color, members in self.groups:
+                sprite = self.sprite(size, color)
+                if np is not None:
+                    # Dense rings put many particles on the same pixel; the
+                    # sprites are opaque, so each position only needs one blit
+                    keys = np.unique((xs[members] + (32768 - size)) * 65536 + (ys[members] + (32768 - size)))
+                    positions = zip(((keys >> 16) - 32768).tolist(), ((keys & 0xFFFF) - 32768).tolist())
+                else:
+                    positions = ((xs[i] - size, ys[i] - size) for i in members)
+                surface.blits([(sprite, position) for position in positions], False)
+            
+            # One bounding box for the whole particle cloud
+            largest = max(self.sizes)
+            if np is not None:
+                left, top, right, bottom = int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())
+            else:
+                left, top, right, bottom = min(xs), min(ys), max(xs), max(ys)
+            dirty.append(pygame.Rect(left - largest, top - largest, right - left + largest * 2 + 1,
+                                     bottom - top + largest * 2 + 1).clip(layout.rect))
+        
+        return [dirty[0].unionall(dirty[1:])]
+
+# Length, base width and theme color of each clock hand
+HANDS = {
+    "hour": (150, 10, "white"),
+    "minute": (200, 8, "white"),
+    "second": (220, 4, "gold"),
+}
+
+# Anti-aliased, tapered clock hands. Each hand is drawn upright once, then
+# rotated with rotozoom and cropped into an LRU cache keyed by scale, color
+# and angle quantized to `step` degrees and bounded by memory, shared by every
+# clock. Sprites in colors of an earlier theme are simply evicted in time. A
+# background thread warms the next few angles each hand will reach, so
+# drawing a hand is normally one cached blit. The second hand turns every
+# frame, so it has a coarser step and a budget of its own, big enough for a
+# full turn at 800x800 (about 23 MB at 1 degree).
+class HandSprites:
+    STEPS = {"second": 1.0}
+    BUDGETS = {"second": 24 * 1024 * 1024}
+    
+    def __init__(self, step=0.5, max_bytes=16 * 1024 * 1024, warm_ahead=4):
+        self.step = step
+        self.max_bytes = max_bytes
+        self.warm_ahead = warm_ahead
+        # One LRU per budget: the second hand's, and one the others share
+        self.sprites = {pool: OrderedDict() for pool in (None, *self.BUDGETS)}
+        self.pool_bytes = dict.fromkeys(self.sprites, 0)
+        self.hits = 0
+        self.misses = 0
+        self.bases = {}
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.requested = set()
+        self.warmer = None
+        # Index each hand was last drawn at, by (hand, scale, color)
+        self.last_index = {}
+    
+    @property
+    def memory_bytes(self):
+        return sum(self.pool_bytes.values())
+    
+    def step_of(self, hand):
+        return self.STEPS.get(hand, self.step)
+    
+    def pool_of(self, hand):
+        return hand if hand in self.BUDGETS else None
+    
+    def dimensions(self, hand, scale):
+        length, width, _ = HANDS[hand]
+        return max(1, round(length * scale)), max(2, round(width * scale))
+    
+    def color(self, hand, theme=None):
+        return getattr(theme or app.theme, HANDS[hand][2])
+    
+    def base(self, hand, scale, color):
+        # Upright hand with its pivot at the bottom center of the surface
+        sprite = self.bases.get((hand, scale, color))
+        if sprite is None:
+            length, width = self.dimensions(hand, scale)
+            half = width // 2 + 1
+            sprite = new_surface((half * 2 + 1, length + half + 1), pygame.SRCALPHA)
+            pivot_x, pivot_y = half, length
+            points = [(pivot_x - width // 2, pivot_y), (pivot_x, pivot_y - length), (pivot_x + width // 2, pivot_y)]
+            gfxdraw.filled_polygon(sprite, points, color)
+            gfxdraw.aapolygon(sprite, points, color)
+            self.bases[(hand, scale, color)] = sprite
+        return sprite
+    
+    @staticmethod
+    def size_of(entry):
+        sprite = entry[0]
+        return sprite.get_width() * sprite.get_height() * sprite.get_bytesize()
+    
+    def drop_scales(self, scales):
+        # Bases and sprites of scales no clock is drawn at any more
+        with self.lock:
+            for key in [key for key in self.bases if key[1] not in scales]:
+                del self.bases[key]
+            for pool, sprites in self.sprites.items():
+                for key in [key for key in sprites if key[1] not in scales]:
+                    self.pool_bytes[pool] -= self.size_of(sprites.pop(key))
+    
+    def render(self, hand, scale, color, index):
+        base = self.base(hand, scale, color)
+        # Screen angles grow clockwise from 3 o'clock; the base points at -90
+        angle = index * self.step_of(hand)
+        rotated = counted(pygame.transform.rotozoom(base, -(angle + 90), 1))
+        if pygame.display.get_surface() is not None:
+            rotated = counted(rotated.convert_alpha())
+        # Only the pixels the hand covers; a diagonal hand leaves a lot empty
+        bounds = rotated.get_bounding_rect()
+        sprite = counted(counted(rotated.subsurface(bounds)).copy())
+        
+        # Where the pivot ends up relative to the cropped sprite's top-left
+        length = self.dimensions(hand, scale)[0]
+        pivot = pygame.math.Vector2(base.get_width() / 2, length) - pygame.math.Vector2(base.get_size()) / 2
+        pivot = pivot.rotate(angle + 90) + pygame.math.Vector2(rotated.get_size()) / 2
+        return sprite, (round(pivot.x) - bounds.x, round(pivot.y) - bounds.y)
+    
+    def store(self, key, entry):
+        pool = self.pool_of(key[0])
+        sprites = self.sprites[pool]
+        budget = self.BUDGETS.get(pool, self.max_bytes)
+        with self.lock:
+            if key in sprites:
+                return
+            sprites[key] = entry
+            self.pool_bytes[pool] += self.size_of(entry)
+            while self.pool_bytes[pool] > budget and len(sprites) > 1:
+                _, evicted = sprites.popitem(last=False)
+                self.pool_bytes[pool] -= self.size_of(evicted)
+    
+    def get(self, hand, angle, scale=1.0):
+        step = self.step_of(hand)
+        index = round(angle / step) % round(360 / step)
+        color = self.color(hand)
+        key = (hand, scale, color, index)
+        sprites = self.sprites[self.pool_of(hand)]
+        with self.lock:
+            entry = sprites.get(key)
+            if entry is not None:
+                sprites.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            self.misses += 1
+            entry = self.render(*key)
+            self.store(key, entry)
+        self.warm(hand, scale, color, index)
+        return entry
+    
+    def warm(self, hand, scale, color, index):
+        # Queue the angles just ahead of the hand for the background thread,
+        # unless it is jumping further than that each frame (time-warp)
+        steps_per_turn = round(360 / self.step_of(hand))
+        last = self.last_index.get((hand, scale, color), index)
+        self.last_index[(hand, scale, color)] = index
+        if (index - last) % steps_per_turn > self.warm_ahead:
+            return
+        if self.warmer is None:
+            self.warmer = threading.Thread(target=self.run_warmer, name="hand-sprites", daemon=True)
+            self.warmer.start()
+        sprites = self.sprites[self.pool_of(hand)]
+        for ahead in range(1, self.warm_ahead + 1):
+            key = (hand, scale, color, (index + ahead) % steps_per_turn)
+            if key not in sprites and key not in self.requested:
+                self.requested.add(key)
+                self.requests.put(key)
+    
+    def run_warmer(self):
+        while True:
+            key = self.requests.get()
+            self.store(key, self.render(*key))
+            self.requested.discard(key)
+    
+    def draw(self, surface, hand, angle, pivot, scale=1.0):
+        sprite, (pivot_x, pivot_y) = self.get(hand, angle, scale)
+        return surface.blit(sprite, (pivot[0] - pivot_x, pivot[1] - pivot_y))
+
+hand_sprites = HandSprites()
+
+# Static clock face: background, dial, tick marks, zodiac rings and images.
+# None of it changes between frames, so it is baked once into a surface in
+# the display format and only rebuilt when the layout, colors or assets
+# change. Faces are shared: clocks with the same size and zodiac wheel (a
+# world-clock grid) all draw from one surface.
+class FaceLayer:
+    def __init__(self, max_size=4):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+    
+    def key(self, layout, zodiac_index):
+        return (layout.rect.size, layout.scale, layout.clock_radius, layout.zodiac_radius, zodiac_index,
+                zodiac_index.version, app.theme.black, app.theme.white)
+    
+    def get(self, layout, zodiac_index):
+        key = self.key(layout, zodiac_index)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            self.store(layout, zodiac_index, self.render(layout, zodiac_index))
+            surface = self.surfaces[key]
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+    
+    def store(self, layout, zodiac_index, surface):
+        # Also used to hand over a face built ahead of time by LayoutRebuilder
+        self.surfaces[self.key(layout, zodiac_index)] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+    
+    def drop_unused(self, layouts, zodiac_index):
+        # Faces for sizes, scales, colors or images no layout shows any more
+        live = {self.key(layout, zodiac_index) for layout in layouts}
+        for key in [key for key in self.surfaces if key not in live]:
+            del self.surfaces[key]
+    
+    def render(self, layout, zodiac_index, images=None, theme=None):
+        # Drawn in rect-local coordinates; the clock blits it at its rect.
+        # `images` overrides the signs' current images (by sign)
+        theme = theme or app.theme
+        surface = new_surface(layout.rect.size)
+        if pygame.display.get_surface() is not None:
+            surface = counted(surface.convert())
+        surface.fill(theme.black)
+        
+        center = layout.local_center
+        radius = layout.clock_radius
+        pygame.draw.circle(surface, theme.white, center, radius, layout.scaled(3))
+        
+        for i in range(60):
+            angle = i * 6 - 90
+            start_pos = (
+                center[0] + (radius - layout.scaled(10)) * math.cos(math.radians(angle)),
+                center[1] + (radius - layout.scaled(10)) * math.sin(math.radians(angle))
+            )
+            if i % 5 == 0:
+                end_pos = (
+                    center[0] + (radius - layout.scaled(30)) * math.cos(math.radians(angle)),
+                    center[1] + (radius - layout.scaled(30)) * math.sin(math.radians(angle))
+                )
+                width = layout.scaled(3)
+            else:  # Minute marks
+                end_pos = (
+                    center[0] + (radius - layout.scaled(20)) * math.cos(math.radians(angle)),
+                    center[1] + (radius - layout.scaled(20)) * math.sin(math.radians(angle))
+                )
+                width = 1
+            pygame.draw.line(surface, theme.white, start_pos, end_pos, width)
+        
+        # Inner zodiac circle
+        pygame.draw.circle(surface, theme.white, center, layout.zodiac_radius, layout.scaled(2))
+        
+        # Zodiac signs
+        image_size = (layout.scaled(50), layout.scaled(50))
+        positions = zodiac_index.place(center, layout.zodiac_radius)
+        for sign in zodiac_index:
+            image = images.get(sign) if images else None
+            if image is None:
+                image = zodiac_index.image(sign, image_size)
+            surface.blit(image, image.get_rect(center=positions[sign]))
+        
+        # Inner zodiac symbols circle
+        pygame.draw.circle(surface, theme.white, center, layout.scaled(100), 1)
+        
+        return surface
+
+face_layer = FaceLayer()
+
+# Time sources for TimeEngine. Both only expose monotonic_ns(); the manual one
+# is advanced by hand for benchmarks, replays and tests.
+class MonotonicClock:
+    def monotonic_ns(self):
+        return time.monotonic_ns()
+
+class ManualClock:
+    def __init__(self, start_ns=0):
+        self.ns = start_ns
+    
+    def monotonic_ns(self):
+        return self.ns
+    
+    def advance(self, seconds):
+        self.ns += round(seconds * 1000000000)
+
+# Clock time derived from a monotonic source: an anchor datetime plus the
+# monotonic time elapsed since the anchor, times a speed multiplier for
+# time-warp. Unlike datetime.now() it never jumps on NTP adjustments. While
+# following the system clock it re-anchors if the two drift apart by more
+# than a second (e.g. a DST change), checked at most once a minute.
+class TimeEngine:
+    RESYNC_INTERVAL_NS = 60 * 1000000000
+    
+    def __init__(self, source=None, start=None, speed=1.0):
+        self.follow_system = source is None and start is None and speed == 1.0
+        self.source = source or MonotonicClock()
+        self.speed = speed
+        self.anchor_ns = self.source.monotonic_ns()
+        self.anchor_time = start or datetime.datetime.now()
+        self.last_real_ns = self.anchor_ns
+        self.last_resync_ns = self.anchor_ns
+    
+    def now(self, ns=None):
+        # Clock time at monotonic time `ns`, by default the current time; a
+        # frame paced to a deadline asks for the time it will be shown at
+        if ns is None:
+            ns = self.source.monotonic_ns()
+        if self.follow_system and ns - self.last_resync_ns >= self.RESYNC_INTERVAL_NS:
+            self.last_resync_ns = ns
+            wall = datetime.datetime.now()
+            if abs((wall - self.time_at(ns)).total_seconds()) > 1:
+                self.anchor_ns, self.anchor_time = ns, wall
+        return self.time_at(ns)
+    
+    def time_at(self, ns):
+        return self.anchor_time + datetime.timedelta(microseconds=(ns - self.anchor_ns) * self.speed / 1000)
+    
+    def set_time(self, when):
+        # Jump to a given clock time; it keeps advancing from there
+        self.anchor_ns = self.source.monotonic_ns()
+        self.anchor_time = when
+        self.follow_system = False
+    
+    def elapsed_real_ns(self):
+        # Unwarped nanoseconds since the previous call, for animation timing
+        ns = self.source.monotonic_ns()
+        elapsed = ns - self.last_real_ns
+        self.last_real_ns = ns
+        return elapsed
+
+# Turns elapsed time into a whole number of fixed animation steps. One step is
+# one frame of the original 60 FPS animation; leftover time carries over, and
+# a long stall is capped so it doesn't trigger a burst of catch-up steps.
+class FixedTimestep:
+    def __init__(self, step=1 / 60, max_steps=10):
+        # Integer nanoseconds so equal-length frames never drift across a step
+        self.step_ns = round(step * 1000000000)
+        self.max_steps = max_steps
+        self.accumulator_ns = 0
+    
+    def advance(self, elapsed_ns):
+        self.accumulator_ns += elapsed_ns
+        steps, self.accumulator_ns = divmod(self.accumulator_ns, self.step_ns)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator_ns = 0
+        return steps
+
+# What the zodiac highlight follows: the hour hand, the Sun's sign, or the
+# Sun's sign plus a ring around the Moon's
+SIGN_MODES = ("hour", "sun", "sun-moon")
+
+# Everything a clock's draw() reads of its animated state, copied at the
+# end of an update. Drawing from a snapshot rather than the live objects lets
+# the threaded main loop draw one frame while the next event is already being
+# handled; like a Theme, a snapshot is never modified.
+class ClockSnapshot:
+    def __init__(self, clock):
+        self.time = clock.current_time
+        self.flames = tuple(flame.state() for flame in clock.flames)
+        self.decoration = clock.central_decoration.state()
+        self.highlighted_sign = clock.highlighted_sign
+        self.moon_sign = clock.moon_sign
+        self.highlight_glow = clock.highlight_glow
+        self.button_hovered = clock.change_time_button.is_hovered
+        self.modal = clock.time_modal.state()
 
 class AstrologicalClock:
-    def __init__(self):
-        self.current_time = datetime.datetime.now()
+    def __init__(self, dirty_rects=False, particle_count=12, animate=True, time_engine=None,
+                 highlight=("Leo",), layout=None, zodiac_index=None, show_controls=True, label=None,
+                 sign_mode="hour"):
+        # Clock time comes from the time engine; pass one built on a
+        # ManualClock for deterministic runs
+        self.time_engine = time_engine or TimeEngine()
+        self.current_time = self.time_engine.now()
         self.custom_time_set = False
-        self.clock_start_time = datetime.datetime.now()
-        self.real_start_time = datetime.datetime.now()
+        # Shift of the shown time from the real instant, for world clocks
+        self.time_offset = datetime.timedelta(0)
+        self.animation_steps = FixedTimestep()
+        
+        # Where on the target surface the clock goes; the whole 800x800
+        # window by default
+        self.layout = layout or ClockLayout()
+        self.flames = [Flame(h, self.layout) for h in range(1, 13)]
+        
+        # Clocks can share a zodiac wheel (and so its images and face); the
+        # one that creates the wheel also loads its images
+        if zodiac_index is None:
+            self.zodiac_wheel = create_zodiac_wheel()
+            self.zodiac_index = ZodiacIndex(self.zodiac_wheel, highlight)
+            image_size = (self.layout.scaled(50), self.layout.scaled(50))
+            self.asset_loader = ZodiacAssetLoader(self.zodiac_index, image_size)
+            self.asset_loader.start()
+        else:
+            self.zodiac_wheel = zodiac_index.by_position[0]
+            self.zodiac_index = zodiac_index
+            self.asset_loader = None
+        self.sign_positions = self.zodiac_index.place(self.layout.center, self.layout.zodiac_radius)
+        self.central_decoration = CentralDecoration(particle_count, self.layout)
+        self.face_layer = face_layer
+        
+        # The time button and modal; without them the clock only shows its
+        # time and label (e.g. a world-clock grid cell)
+        self.show_controls = show_controls
+        self.label = label
+        self.time_modal = TimeInputModal(self.layout)
+        self.change_time_button = self.create_time_button()
         
-        self.flames = [Flame(h, HOUR_FLAME_RADIUS) for h in range(1, 13)]
-        self.zodiac_wheel = create_zodiac_wheel()
-        self.central_decoration = CentralDecoration()
+        # Sign highlighted by the hour hand (Leo by default) or, in the "sun"
+        # and "sun-moon" modes, the Sun's sign from the ephemeris tables, and
+        # its glow pulse
+        self.sign_mode = sign_mode
+        self.highlighted_sign = None
+        self.moon_sign = None
+        self.highlight_glow = 0
+        self.highlight_glow_direction = 1
+        self.time_backgrounds = {}
         
-        self.time_modal = TimeInputModal()
-        self.change_time_button = Button(WIDTH - 140, 20, 120, 40, "Cambiar Hora")
+        # With animation off only the hands move, once per second
+        self.animate = animate
         
-        self.leo_effect_active = False
-        self.leo_glow = 0
-        self.leo_glow_direction = 1
+        # Dirty-rect rendering: draw() returns the regions to update instead
+        # of requiring a full display flip
+        self.dirty_rects = dirty_rects
+        self.previous_dirty = []
+        self.last_face = None
+        self.full_redraw = True
+        
+        # Draw order; each stage returns the rects it touched. stage_timer, if
+        # set, is called as stage_timer(name, seconds) after every stage.
+        self.draw_stages = [
+            ("dial", self.draw_dial),
+            ("flames", self.draw_flames),
+            ("zodiac", self.draw_zodiac),
+            ("decoration", self.draw_decoration),
+            ("hands", self.draw_clock_hands),
+            ("ui", self.draw_ui),
+        ]
+        self.stage_timer = None
+        self.overlays = []
+    
+    def create_time_button(self):
+        # Top right corner of the clock's rect
+        rect, s = self.layout.rect, self.layout.scaled
+        return Button(rect.right - s(140), rect.top + s(20), s(120), s(40), "Cambiar Hora",
+                      font=self.layout.font_small)
+    
+    def set_layout(self, layout):
+        # Move the clock to another rect or scale; the animation state is kept.
+        # LayoutRebuilder builds the expensive layers for it beforehand.
+        self.layout = layout
+        for flame in self.flames:
+            flame.place(layout)
+        self.central_decoration.place(layout)
+        self.sign_positions = self.zodiac_index.place(layout.center, layout.zodiac_radius)
+        self.time_modal.place(layout)
+        self.change_time_button = self.create_time_button()
+        self.previous_dirty = []
+        self.request_full_redraw()
+    
+    @property
+    def rect(self):
+        return self.layout.rect
+    
+    def layouts_for(self, rect, theme=None):
+        return [ClockLayout(rect, theme)]
+    
+    def apply_layouts(self, rect, layouts):
+        self.set_layout(layouts[0])
     
     def set_custom_time(self, hours, minutes, seconds):
-        self.real_start_time = datetime.datetime.now()
-        
-        now = datetime.datetime.now()
-        self.clock_start_time = now.replace(hour=hours, minute=minutes, second=seconds)
+        # The sub-second part is kept so clocks set to different times still
+        # tick over together
+        now = self.time_engine.now()
+        self.time_engine.set_time(now.replace(hour=hours, minute=minutes, second=seconds))
         self.custom_time_set = True
     
-    def update(self, mouse_pos):
-        elapsed = datetime.datetime.now() - self.real_start_time
+    def set_time_offset(self, hours):
+        # Show the current time shifted by a time zone offset, date included;
+        # the Sun and Moon are still looked up for the unshifted instant
+        self.time_offset = datetime.timedelta(hours=hours)
+        self.time_engine.set_time(self.time_engine.now() + self.time_offset)
+        self.custom_time_set = True
+    
+    def update(self, mouse_pos, present_ns=None):
+        # present_ns: when the frame will be shown, if the frame pacer knows
+        self.current_time = self.time_engine.now(present_ns)
         
-        if self.custom_time_set:
-            self.current_time = self.clock_start_time + elapsed
-        else:
-            self.current_time = datetime.datetime.now()
+        # Animations advance in fixed steps of real (unwarped) time, so they
+        # run at the same speed whatever the frame rate
+        steps = self.animation_steps.advance(self.time_engine.elapsed_real_ns()) if self.animate else 0
+        
+        # Swap in the zodiac images once the background loader is done; the
+        # new index version makes the face layer rebuild
+        if self.asset_loader is not None:
+            self.asset_loader.poll()
         
         self.change_time_button.update(mouse_pos)
         self.time_modal.update(mouse_pos)
@@ -419,135 +1548,202 @@ class AstrologicalClock:
             current_hour = 12
             
         for flame in self.flames:
-            flame.update(current_hour)
+            flame.update(current_hour, steps)
         
-        self.central_decoration.update()
+        self.central_decoration.update(steps)
         
-        hour_angle = (self.current_time.hour % 12) * 30 + self.current_time.minute / 2 - 90
-        if 142 <= hour_angle % 360 <= 158:
-            self.leo_effect_active = True
-            self.leo_glow += self.leo_glow_direction * 5
-            if self.leo_glow >= 200 or self.leo_glow <= 50:
-                self.leo_glow_direction *= -1
+        if self.sign_mode == "hour":
+            hour_angle = (self.current_time.hour % 12) * 30 + self.current_time.minute / 2 - 90
+            sign = self.zodiac_index.highlighted_sign(hour_angle)
         else:
-            self.leo_effect_active = False
-            self.leo_glow = 0
-    
-    def draw(self, surface):
-        
-        surface.fill(BLACK)
+            instant = self.current_time - self.time_offset
+            sign = self.zodiac_index.buckets[ephemeris.sun.sign_at(instant)]
+            if self.sign_mode == "sun-moon":
+                self.moon_sign = self.zodiac_index.buckets[ephemeris.moon.sign_at(instant)]
+        if sign is not self.highlighted_sign:
+            self.highlighted_sign = sign
+            self.highlight_glow = 0
+            self.highlight_glow_direction = 1
+        if sign is None:
+            return
         
-       
-        pygame.draw.circle(surface, WHITE, CENTER, CLOCK_RADIUS, 3)
+        if not self.animate:
+            self.highlight_glow = 150
+            return
+        for _ in range(steps):
+            self.highlight_glow += self.highlight_glow_direction * 5
+            if self.highlight_glow >= 200 or self.highlight_glow <= 50:
+                self.highlight_glow_direction *= -1
+    
+    def request_full_redraw(self):
+        # Window contents were lost (exposed, restored); repaint everything
+        self.last_face = None
+    
+    def seconds_to_next_second(self):
+        # Real seconds until the displayed second changes
+        return (1 - self.current_time.microsecond / 1000000) / self.time_engine.speed
+    
+    def snapshot(self):
+        return ClockSnapshot(self)
+    
+    def draw(self, surface, snapshot=None):
+        # Draws `snapshot`, or the current state
+        state = snapshot or self.snapshot()
+        dirty = []
+        timer = self.stage_timer
+        for name, stage in self.draw_stages:
+            if timer is None:
+                dirty += stage(surface, state)
+            else:
+                start = time.perf_counter()
+                dirty += stage(surface, state)
+                timer(name, time.perf_counter() - start)
         
-       
-        for i in range(60):
-            angle = i * 6 - 90
-            start_pos = (
-                CENTER[0] + (CLOCK_RADIUS - 10) * math.cos(math.radians(angle)),
-                CENTER[1] + (CLOCK_RADIUS - 10) * math.sin(math.radians(angle))
-            )
-            if i % 5 == 0:
-                end_pos = (
-                    CENTER[0] + (CLOCK_RADIUS - 30) * math.cos(math.radians(angle)),
-                    CENTER[1] + (CLOCK_RADIUS - 30) * math.sin(math.radians(angle))
-                )
-                width = 3
-            else:  # Minute marks
-                end_pos = (
-                    CENTER[0] + (CLOCK_RADIUS - 20) * math.cos(math.radians(angle)),
-                    CENTER[1] + (CLOCK_RADIUS - 20) * math.sin(math.radians(angle))
-                )
-                width = 1
-            pygame.draw.line(surface, WHITE, start_pos, end_pos, width)
+        if not self.dirty_rects:
+            return None
         
-        # Draw flames (hour indicators)
-        for flame in self.flames:
-            flame.draw(surface)
+        # Regions to push to the display: what was drawn last frame (now
+        # erased) plus what was drawn this frame
+        if self.full_redraw:
+            update_rects = [self.layout.rect]
+        else:
+            update_rects = self.previous_dirty + dirty
+        self.previous_dirty = dirty
+        return update_rects
+    
+    def draw_dial(self, surface, state):
+        # Static dial and zodiac ring come from the cached face layer
+        face = self.face_layer.get(self.layout, self.zodiac_index)
         
-        # Draw inner zodiac circle
-        pygame.draw.circle(surface, WHITE, CENTER, ZODIAC_RADIUS, 2)
+        # In dirty-rect mode only the regions touched last frame are restored;
+        # a new face (first frame, resize, asset swap) forces a full redraw
+        self.full_redraw = not self.dirty_rects or face is not self.last_face
+        origin = self.layout.rect.topleft
+        if self.full_redraw:
+            surface.blit(face, origin)
+        else:
+            for rect in self.previous_dirty:
+                surface.blit(face, rect, rect.move(-origin[0], -origin[1]))
+        self.last_face = face
+        return []
+    
+    def draw_flames(self, surface, state):
+        # All twelve flames go out in a single batched blit
+        items = []
+        for flame, flame_state in zip(self.flames, state.flames):
+            items += flame.blit_items(flame_state)
+        return surface.blits(items)
+    
+    def draw_zodiac(self, surface, state):
+        # The signs themselves are part of the face; only the highlight is animated
+        dirty = []
+        if state.highlighted_sign is not None:
+            dirty += self.draw_sign_highlight(surface, state.highlighted_sign, state.highlight_glow)
+        if state.moon_sign is not None:
+            x, y = self.sign_positions[state.moon_sign]
+            dirty.append(pygame.draw.circle(surface, app.theme.moon, (int(x), int(y)), self.layout.scaled(36),
+                                            self.layout.scaled(2)))
+        return dirty
+    
+    def draw_decoration(self, surface, state):
+        return self.central_decoration.draw(surface, state.decoration)
+    
+    def draw_ui(self, surface, state):
+        # Display current time elegantly in the top left
+        dirty = self.draw_time_display(surface, state.time)
         
-        # Draw zodiac signs
-        current_sign = self.zodiac_wheel
-        for _ in range(12):
-            angle_rad = math.radians(current_sign.angle - 90)  # Adjust to start from top
-            x = CENTER[0] + ZODIAC_RADIUS * math.cos(angle_rad)
-            y = CENTER[1] + ZODIAC_RADIUS * math.sin(angle_rad)
-            
-            sign_rect = current_sign.image.get_rect(center=(x, y))
+        if self.show_controls:
+            # Draw change time button in the top right
+            dirty += self.change_time_button.draw(surface, state.button_hovered)
             
-            # Special Leo effect
-            if current_sign.name == "Leo" and self.leo_effect_active:
-                # Create glow effect
-                glow_surface = pygame.Surface((100, 100), pygame.SRCALPHA)
-                pygame.draw.circle(glow_surface, (GOLD[0], GOLD[1], GOLD[2], self.leo_glow), (50, 50), 40)
-                surface.blit(glow_surface, (x - 50, y - 50))
-                
-                # Draw highlighted border
-                pygame.draw.circle(surface, GOLD, (int(x), int(y)), 30, 2)
-            
-            surface.blit(current_sign.image, sign_rect)
-            current_sign = current_sign.next
-        
-        # Draw central decoration
-        self.central_decoration.draw(surface)
+            # Draw time modal dialog if active
+            dirty += self.time_modal.draw(surface, state.modal)
         
-        # Draw inner zodiac symbols circle
-        pygame.draw.circle(surface, WHITE, CENTER, 100, 1)
-        
-        # Draw clock hands
-        self.draw_clock_hands(surface)
-        
-        # Display current time elegantly in the top left
-        time_str = self.current_time.strftime("%H:%M:%S")
+        # Debug overlays (e.g. the frame profiler) go on top of everything
+        for overlay in self.overlays:
+            dirty += overlay(surface)
+        return dirty
+    
+    def draw_time_display(self, surface, current_time):
+        time_str = current_time.strftime("%H:%M:%S")
+        if self.label:
+            time_str = f"{self.label}  {time_str}"
+        layout = self.layout
         
         # Create a semi-transparent background for the time display
-        time_surface = font_small.render(time_str, True, WHITE)
-        time_bg_rect = pygame.Rect(20, 20, time_surface.get_width() + 20, 40)
-        time_bg = pygame.Surface((time_bg_rect.width, time_bg_rect.height), pygame.SRCALPHA)
-        time_bg.fill((20, 20, 30, 150))
+        time_surface = text_cache.render(layout.font_small, time_str, True, app.theme.white)
+        time_bg_rect = pygame.Rect(layout.rect.x + layout.scaled(20), layout.rect.y + layout.scaled(20),
+                                   time_surface.get_width() + layout.scaled(20), layout.scaled(40))
+        # Backgrounds are kept per width; digit widths vary with the font
+        time_bg = self.time_backgrounds.get(time_bg_rect.size)
+        if time_bg is None:
+            time_bg = new_surface(time_bg_rect.size, pygame.SRCALPHA)
+            time_bg.fill((20, 20, 30, 150))
+            self.time_backgrounds[time_bg_rect.size] = time_bg
         surface.blit(time_bg, time_bg_rect)
-        pygame.draw.rect(surface, WHITE, time_bg_rect, 1, border_radius=5)
+        pygame.draw.rect(surface, app.theme.white, time_bg_rect, 1, border_radius=5)
         
         # Draw the time text
-        surface.blit(time_surface, (time_bg_rect.x + 10, time_bg_rect.y + 10))
+        surface.blit(time_surface, (time_bg_rect.x + layout.scaled(10), time_bg_rect.y + layout.scaled(10)))
+        return [time_bg_rect]
+    
+    def draw_sign_highlight(self, surface, sign, glow):
+        x, y = self.sign_positions[sign]
+        layout = self.layout
+        half = layout.scaled(50)
+        
+        # Create glow effect
+        glow_surface = surface_pool.scratch((half * 2, half * 2), pygame.SRCALPHA)
+        gold = app.theme.gold
+        pygame.draw.circle(glow_surface, (*gold, glow), (half, half),
+                           layout.scaled(40))
+        dirty = [surface.blit(glow_surface, (x - half, y - half))]
         
-        # Draw change time button in the top right
-        self.change_time_button.draw(surface)
+        # Draw highlighted border
+        dirty.append(pygame.draw.circle(surface, gold, (int(x), int(y)), layout.scaled(30), layout.scaled(2)))
         
-        # Draw time modal dialog if active
-        self.time_modal.draw(surface)
+        # The glow covers the baked image, so put the sign back on top
+        image = self.zodiac_index.image(sign, (half, half))
+        surface.blit(image, image.get_rect(center=(x, y)))
+        return dirty
     
-    def draw_clock_hands(self, surface):
-        hour = self.current_time.hour % 12
-        minute = self.current_time.minute
-        second = self.current_time.second
-        millisecond = self.current_time.microsecond / 1000000
+    def draw_clock_hands(self, surface, state):
+        current_time = state.time
+        hour = current_time.hour % 12
+        minute = current_time.minute
+        second = current_time.second
+        millisecond = current_time.microsecond / 1000000
+        
+        center = self.layout.center
+        scale = self.layout.scale
         
         # Hour hand - smooth movement
         hour_angle = (hour * 30 + minute / 2) - 90  # Each hour is 30 degrees, -90 to start from top
-        hour_x = CENTER[0] + 150 * math.cos(math.radians(hour_angle))
-        hour_y = CENTER[1] + 150 * math.sin(math.radians(hour_angle))
-        pygame.draw.line(surface, WHITE, CENTER, (hour_x, hour_y), 6)
+        dirty = [hand_sprites.draw(surface, "hour", hour_angle, center, scale)]
         
         # Minute hand - smooth movement
         minute_angle = (minute * 6 + second / 10) - 90  # Each minute is 6 degrees, with smooth movement from seconds
-        minute_x = CENTER[0] + 200 * math.cos(math.radians(minute_angle))
-        minute_y = CENTER[1] + 200 * math.sin(math.radians(minute_angle))
-        pygame.draw.line(surface, WHITE, CENTER, (minute_x, minute_y), 4)
+        dirty.append(hand_sprites.draw(surface, "minute", minute_angle, center, scale))
         
         # Second hand - smooth movement
         second_angle = (second * 6 + millisecond * 6) - 90  # Each second is 6 degrees, with smooth movement
-        second_x = CENTER[0] + 220 * math.cos(math.radians(second_angle))
-        second_y = CENTER[1] + 220 * math.sin(math.radians(second_angle))
-        pygame.draw.line(surface, GOLD, CENTER, (second_x, second_y), 2)
+        dirty.append(hand_sprites.draw(surface, "second", second_angle, center, scale))
         
         # Center circle
-        pygame.draw.circle(surface, WHITE, CENTER, 10)
-        pygame.draw.circle(surface, GOLD, CENTER, 5)
+        outer = self.layout.scaled(10)
+        inner = self.layout.scaled(5)
+        theme = app.theme
+        gfxdraw.aacircle(surface, center[0], center[1], outer, theme.white)
+        gfxdraw.filled_circle(surface, center[0], center[1], outer, theme.white)
+        gfxdraw.aacircle(surface, center[0], center[1], inner, theme.gold)
+        gfxdraw.filled_circle(surface, center[0], center[1], inner, theme.gold)
+        dirty.append(pygame.Rect(center[0] - outer - 1, center[1] - outer - 1, outer * 2 + 3, outer * 2 + 3))
+        return dirty
     
     def handle_event(self, event):
+        if not self.show_controls:
+            return
+        
         # Handle button clicks
         if event.type == pygame.MOUSEBUTTONDOWN:
             if self.change_time_button.rect.collidepoint(event.pos):
@@ -556,38 +1752,1299 @@ class AstrologicalClock:
         # Pass events to the time modal
         self.time_modal.handle_event(event)
 
+# World clock: one clock per time zone offset (in hours from local time),
+# tiled into a grid inside `rect`. The clocks share one zodiac wheel, so they
+# also share its face layer, and draw from the same flame atlas, text and hand
+# caches; only the moving parts are drawn per clock.
+class WorldClockGrid:
+    def __init__(self, offsets, rect=(0, 0, WIDTH, HEIGHT), dirty_rects=False, particle_count=12,
+                 animate=True, highlight=("Leo",), time_source=None, start=None, speed=1.0, sign_mode="hour"):
+        self.rect = pygame.Rect(rect)
+        self.offsets = list(offsets)
+        self.dirty_rects = dirty_rects
+        layouts = self.layouts_for(self.rect)
+        self.zodiac_index = ZodiacIndex(create_zodiac_wheel(), highlight)
+        image_size = (layouts[0].scaled(50), layouts[0].scaled(50))
+        self.asset_loader = ZodiacAssetLoader(self.zodiac_index, image_size)
+        self.asset_loader.start()
+        
+        self.clocks = []
+        for offset, layout in zip(self.offsets, layouts):
+            clock = AstrologicalClock(dirty_rects=dirty_rects, particle_count=particle_count, animate=animate,
+                                      time_engine=TimeEngine(time_source, start, speed), layout=layout,
+                                      zodiac_index=self.zodiac_index, show_controls=False,
+                                      label=f"{offset:+g}h", sign_mode=sign_mode)
+            clock.set_time_offset(offset)
+            self.clocks.append(clock)
+        
+        self.cleared = False
+        self.overlays = []
+    
+    def layouts_for(self, rect, theme=None):
+        # One cell per clock, filled row by row in a near-square grid
+        columns = math.ceil(math.sqrt(len(self.offsets)))
+        rows = math.ceil(len(self.offsets) / columns)
+        cell_width, cell_height = rect.width // columns, rect.height // rows
+        return [ClockLayout((rect.x + (i % columns) * cell_width, rect.y + (i // columns) * cell_height,
+                             cell_width, cell_height), theme)
+                for i in range(len(self.offsets))]
+    
+    def apply_layouts(self, rect, layouts):
+        self.rect = pygame.Rect(rect)
+        for clock, layout in zip(self.clocks, layouts):
+            clock.set_layout(layout)
+        self.cleared = False
+    
+    @property
+    def stage_timer(self):
+        return self.clocks[0].stage_timer
+    
+    @stage_timer.setter
+    def stage_timer(self, timer):
+        for clock in self.clocks:
+            clock.stage_timer = timer
+    
+    def update(self, mouse_pos, present_ns=None):
+        self.asset_loader.poll()
+        for clock in self.clocks:
+            clock.update(mouse_pos, present_ns)
+    
+    def request_full_redraw(self):
+        self.cleared = False
+        for clock in self.clocks:
+            clock.request_full_redraw()
+    
+    def seconds_to_next_second(self):
+        return min(clock.seconds_to_next_second() for clock in self.clocks)
+    
+    def snapshot(self):
+        return tuple(clock.snapshot() for clock in self.clocks)
+    
+    def draw(self, surface, snapshot=None):
+        # Cells don't always tile the rect exactly; clear the gaps once
+        full_redraw = not self.cleared
+        if full_redraw:
+            surface.fill(app.theme.black, self.rect)
+            self.cleared = True
+        
+        dirty = []
+        for clock, state in zip(self.clocks, snapshot or self.snapshot()):
+            dirty += clock.draw(surface, state) or []
+        for overlay in self.overlays:
+            dirty += overlay(surface)
+        
+        if not self.dirty_rects:
+            return None
+        return [self.rect] if full_redraw else dirty
+    
+    def handle_event(self, event):
+        for clock in self.clocks:
+            clock.handle_event(event)
+
+# Re-lays out a clock (or grid) when the window changes size or the theme
+# file changes. Requests are debounced so dragging a window edge or an editor
+# saving twice doesn't rebuild every frame. Everything the new layout or
+# theme needs (fonts, zodiac images, faces, flame atlases, hand sprites and
+# common text) is built on a background thread while the old one keeps
+# drawing, then swapped in between two frames by poll(). A theme reload only
+# rebuilds what Theme.changes() says the differences invalidate.
+class LayoutRebuilder:
+    # Text every clock draws; rendered ahead for a new font or color
+    COMMON_TEXT = (("font_large", ROMAN_NUMERALS + ["Cambiar Hora"]), ("font_small", ["Cambiar Hora", "Aplicar", "✕"]))
+    
+    def __init__(self, target, debounce=0.25):
+        self.target = target
+        self.debounce = debounce
+        self.pending = False
+        self.pending_rect = None
+        self.pending_theme_path = None
+        self.requested_at = 0
+        self.thread = None
+        self.result = None
+    
+    def request(self, rect=None, theme_path=None):
+        # A new window rect, a theme file to reload, or both; the other keeps its current value
+        if rect is not None:
+            self.pending_rect = pygame.Rect(rect)
+        if theme_path is not None:
+            self.pending_theme_path = theme_path
+        self.pending = True
+        self.requested_at = time.perf_counter()
+    
+    def build(self, rect, theme_path):
+        target = self.target
+        zodiac_index = target.zodiac_index
+        theme = app.theme
+        new_theme = theme
+        if theme_path is not None:
+            try:
+                new_theme = Theme.load(theme_path)
+            except (OSError, ValueError) as e:
+                print(f"theme {theme_path}: {e}; keeping the current one", file=sys.stderr)
+        changes = theme.changes(new_theme)
+        if rect == target.rect and new_theme is theme:
+            # Nothing to do (e.g. the theme file didn't parse)
+            self.result = None
+            return
+        layouts = target.layouts_for(rect, new_theme)
+        
+        # Zodiac images only for new files or a new image size
+        image_size = (layouts[0].scaled(50), layouts[0].scaled(50))
+        loader = None
+        images = {}
+        if "zodiac" in changes or target.asset_loader is None or target.asset_loader.size != image_size:
+            loader = ZodiacAssetLoader(zodiac_index, image_size, theme=new_theme)
+            loader.run()
+            images = loader.images()
+        
+        # Placeholders are drawn in the theme's color and font
+        if "zodiac" in changes:
+            stale = [sign for sign in zodiac_index if sign not in images]
+        elif changes & {"face", "fonts"}:
+            stale = [sign for sign in zodiac_index if sign.placeholder]
+        else:
+            stale = []
+        placeholders = {sign: sign.create_placeholder_image(new_theme) for sign in stale}
+        
+        faces = {}
+        if loader is not None or placeholders or changes & {"face", "layout"} or rect != target.rect:
+            for layout in layouts:
+                key = (layout.rect.size, layout.scale)
+                if key not in faces:
+                    faces[key] = (layout, face_layer.render(layout, zodiac_index, {**images, **placeholders},
+                                                            new_theme))
+        
+        atlases = {}
+        text = {}
+        for layout in layouts:
+            if layout.scale not in atlases and ("flames" in changes or layout.scale not in flame_atlases):
+                atlases[layout.scale] = FlameAtlas(layout.scale).build(new_theme)
+            for hand in HANDS:
+                hand_sprites.base(hand, layout.scale, hand_sprites.color(hand, new_theme))
+            for font_name, strings in self.COMMON_TEXT:
+                font = getattr(layout, font_name)
+                for string in strings:
+                    key = (font, string, True, new_theme.white)
+                    if key not in text:
+                        text[key] = counted(font.render(string, True, new_theme.white))
+        self.result = (rect, theme_path, new_theme, changes, layouts, loader, placeholders,
+                       list(faces.values()), atlases, text)
+    
+    def drop_unused(self, layouts):
+        # Once a new layout is in: forget faces, fonts, flame atlases, hand
+        # sprites and zodiac placements built for scales no clock is drawn at now.
+        # Unscaled fonts stay, for buttons, placeholders and the overlay.
+        scales = {layout.scale for layout in layouts}
+        keep = {font for layout in layouts for font in (layout.font_large, layout.font_small, layout.font_tiny)}
+        keep |= {font_at(size) for size in (36, 24, 18)}
+        dropped = set()
+        for key in [key for key, font in fonts.items() if font not in keep]:
+            dropped.add(fonts.pop(key))
+        text_cache.discard_fonts(dropped)
+        for scale in [scale for scale in flame_atlases if scale not in scales]:
+            del flame_atlases[scale]
+        hand_sprites.drop_scales(scales)
+        face_layer.drop_unused(layouts, self.target.zodiac_index)
+        # Scratch glows are sized by scale; the next frame makes what it needs
+        surface_pool.clear()
+        self.target.zodiac_index.drop_unused(layouts)
+    
+    def poll(self):
+        # Called on the main thread between frames; True when a layout was swapped in
+        swapped = False
+        result = None
+        if self.thread is not None and not self.thread.is_alive():
+            self.thread = None
+            result, self.result = self.result, None
+        if result is not None:
+            rect, theme_path, theme, changes, layouts, loader, placeholders, faces, atlases, text = result
+            if self.pending:
+                # A newer request arrived while building; that one wins, but
+                # keeps what this one was for unless it replaces it
+                if self.pending_rect is None:
+                    self.pending_rect = rect
+                if self.pending_theme_path is None:
+                    self.pending_theme_path = theme_path
+            else:
+                app.theme = theme
+                if "flames" in changes:
+                    flame_atlases.clear()
+                flame_atlases.update(atlases)
+                if "fonts" in changes:
+                    drop_fonts(theme.font_path)
+                text_cache.preload(text)
+                if loader is not None:
+                    loader.poll()
+                    self.target.asset_loader = loader
+                if placeholders:
+                    for sign, image in placeholders.items():
+                        sign.image = image
+                        sign.placeholder = True
+                    self.target.zodiac_index.version += 1
+                for layout, face in faces:
+                    face_layer.store(layout, self.target.zodiac_index, face)
+                self.target.apply_layouts(rect, layouts)
+                self.drop_unused(layouts)
+                swapped = True
+        
+        if (self.thread is None and self.pending
+                and time.perf_counter() - self.requested_at >= self.debounce):
+            rect = self.pending_rect or self.target.rect
+            theme_path = self.pending_theme_path
+            self.pending, self.pending_rect, self.pending_theme_path = False, None, None
+            self.thread = threading.Thread(target=self.build, args=(rect, theme_path), name="layout", daemon=True)
+            self.thread.start()
+        return swapped
+
+# Watches the theme file for changes from the main loop: one stat() call, at
+# most every `interval` seconds. The file itself is read by LayoutRebuilder.
+class ThemeWatcher:
+    def __init__(self, path, interval=0.5):
+        self.path = path
+        self.interval = interval
+        self.mtime = self.stat()
+        self.checked = time.perf_counter()
+    
+    def stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def poll(self):
+        # True when the file was written (or created) since the last check
+        now = time.perf_counter()
+        if now - self.checked < self.interval:
+            return False
+        self.checked = now
+        mtime = self.stat()
+        if mtime == self.mtime:
+            return False
+        self.mtime = mtime
+        return mtime is not None
+
+# Timing statistics shared by the profiler, the pacing and latency stats and
+# the headless tools. `unit` converts samples to milliseconds: 1000 for
+# seconds, 1e-6 for nanoseconds.
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(samples, unit=1000):
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        "count": count,
+        "mean_ms": sum(ordered) / count * unit,
+        "p50_ms": percentile(ordered, 0.50) * unit,
+        "p99_ms": percentile(ordered, 0.99) * unit,
+        "max_ms": ordered[-1] * unit,
+    }
+
+# Per-stage frame profiler. Stage timings, per-frame Surface allocations and
+# dropped frames are kept in fixed-size ring buffers. When disabled the main
+# loop skips every call, so the cost is a single attribute check per stage.
+class FrameProfiler:
+    HISTOGRAM_EDGES_MS = (0.25, 0.5, 1, 2, 4, 8, 16, 33)
+    
+    def __init__(self, target_fps=60, history=600, output_path=None, snapshot_interval=5.0):
+        self.enabled = False
+        self.show_overlay = False
+        self.target_interval = 1.0 / target_fps
+        self.history = history
+        self.output_path = output_path
+        self.snapshot_interval = snapshot_interval
+        self.clock = None
+        self.scheduler = None
+        self.latency = None
+        self.reset()
+    
+    def reset(self):
+        self.stages = {}
+        self.frame_allocations = deque(maxlen=self.history)
+        self.frames = 0
+        self.dropped_frames = 0
+        self.frame_start = None
+        self.last_mark = None
+        self.last_allocations = surface_allocations
+        self.last_snapshot = time.perf_counter()
+        self.overlay_surface = None
+        self.overlay_updated = 0
+    
+    def attach(self, astrological_clock):
+        self.clock = astrological_clock
+        astrological_clock.overlays.append(self.draw_overlay)
+        if self.enabled:
+            astrological_clock.stage_timer = self.record
+    
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.reset()
+        if self.clock is not None:
+            self.clock.stage_timer = self.record if enabled else None
+    
+    def handle_event(self, event):
+        if event.type != pygame.KEYDOWN:
+            return
+        if event.key == pygame.K_F2:
+            self.set_enabled(not self.enabled)
+        elif event.key == pygame.K_F3:
+            self.show_overlay = not self.show_overlay
+            if self.show_overlay and not self.enabled:
+                self.set_enabled(True)
+    
+    def record(self, name, seconds):
+        samples = self.stages.get(name)
+        if samples is None:
+            samples = self.stages[name] = deque(maxlen=self.history)
+        samples.append(seconds)
+    
+    def begin_frame(self):
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            interval = now - self.frame_start
+            self.record("frame", interval)
+            self.frames += 1
+            # The scheduler's policy sets the pace once attached
+            target_interval = self.scheduler.interval if self.scheduler is not None else self.target_interval
+            if interval > target_interval * 1.5:
+                self.dropped_frames += 1
+            self.frame_allocations.append(surface_allocations - self.last_allocations)
+        self.last_allocations = surface_allocations
+        self.frame_start = now
+        self.last_mark = now
+        
+        if self.output_path and now - self.last_snapshot >= self.snapshot_interval:
+            self.last_snapshot = now
+            self.write_snapshot()
+    
+    def mark(self, name):
+        # Time since the previous mark (or the start of the frame)
+        now = time.perf_counter()
+        self.record(name, now - self.last_mark)
+        self.last_mark = now
+    
+    def snapshot(self):
+        stages = {}
+        for name, samples in self.stages.items():
+            buckets = [0] * (len(self.HISTOGRAM_EDGES_MS) + 1)
+            for seconds in samples:
+                ms = seconds * 1000
+                index = 0
+                while index < len(self.HISTOGRAM_EDGES_MS) and ms > self.HISTOGRAM_EDGES_MS[index]:
+                    index += 1
+                buckets[index] += 1
+            stages[name] = dict(summarize(samples), histogram=buckets)
+        snapshot = {
+            "timestamp": time.time(),
+            "frames": self.frames,
+            "dropped_frames": self.dropped_frames,
+            "surface_allocations": surface_allocations,
+            "surface_allocations_per_frame": (sum(self.frame_allocations) / len(self.frame_allocations)
+                                              if self.frame_allocations else 0),
+            "text_cache": {"hits": text_cache.hits, "misses": text_cache.misses},
+            "hand_sprites": {"hits": hand_sprites.hits, "misses": hand_sprites.misses,
+                             "memory_bytes": hand_sprites.memory_bytes},
+            "histogram_edges_ms": list(self.HISTOGRAM_EDGES_MS),
+            "startup_ms": app.report(),
+            "stages": stages,
+        }
+        if self.scheduler is not None:
+            snapshot["scheduler"] = {"policy": self.scheduler.policy,
+                                     "effective_fps": self.scheduler.effective_fps,
+                                     "pacing": self.scheduler.pacing,
+                                     "jitter": self.scheduler.jitter()}
+        if self.latency is not None:
+            snapshot["input_latency"] = self.latency.stats()
+        return snapshot
+    
+    def write_snapshot(self):
+        snapshot = self.snapshot()
+        if self.output_path.endswith(".csv"):
+            write_header = not os.path.exists(self.output_path)
+            with open(self.output_path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow(["timestamp", "stage", "mean_ms", "p50_ms", "p99_ms", "max_ms",
+                                     "frames", "dropped_frames", "surface_allocations"])
+                for name, stats in snapshot["stages"].items():
+                    writer.writerow([f"{snapshot['timestamp']:.3f}", name, f"{stats['mean_ms']:.4f}",
+                                     f"{stats['p50_ms']:.4f}", f"{stats['p99_ms']:.4f}",
+                                     f"{stats['max_ms']:.4f}", snapshot["frames"],
+                                     snapshot["dropped_frames"], snapshot["surface_allocations"]])
+        else:
+            with open(self.output_path, "w") as f:
+                json.dump(snapshot, f, indent=2)
+    
+    def draw_overlay(self, surface):
+        if not (self.enabled and self.show_overlay):
+            return []
+        
+        # Re-render the text a few times per second; the numbers change every
+        # frame and would only churn the shared text cache
+        now = time.perf_counter()
+        if self.overlay_surface is None or now - self.overlay_updated >= 0.5:
+            self.overlay_updated = now
+            self.overlay_surface = self.render_overlay()
+        
+        rect = self.overlay_surface.get_rect(bottomleft=(10, surface.get_height() - 10))
+        return [surface.blit(self.overlay_surface, rect)]
+    
+    def render_overlay(self):
+        snapshot = self.snapshot()
+        lines = [f"frames {snapshot['frames']}  dropped {snapshot['dropped_frames']}"
+                 f"  surfaces/frame {snapshot['surface_allocations_per_frame']:.1f}"]
+        if "scheduler" in snapshot:
+            scheduler = snapshot["scheduler"]
+            lines.append(f"{scheduler['policy']}  {scheduler['effective_fps']:.1f} FPS  {scheduler['pacing']} pacing")
+            if scheduler["jitter"]:
+                jitter = scheduler["jitter"]
+                lines.append(f"jitter sd {jitter['interval_stdev_ms']:5.2f}  p99 {jitter['deviation_p99_ms']:5.2f}"
+                             f"  shown +{jitter['present_error_mean_ms']:5.2f} ms")
+        for kind, stats in snapshot.get("input_latency", {}).items():
+            lines.append(f"{kind} to photon {stats['p50_ms']:6.2f}  p99 {stats['p99_ms']:6.2f} ms")
+        for name, stats in snapshot["stages"].items():
+            lines.append(f"{name:<10} {stats['mean_ms']:6.2f}  p99 {stats['p99_ms']:6.2f} ms")
+        
+        font = font_at(18)
+        line_height = font.get_linesize()
+        overlay = new_surface((320, line_height * len(lines) + 10), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            overlay.blit(counted(font.render(line, True, app.theme.white)), (5, 5 + i * line_height))
+        return overlay
+
+# Records a session for replay: the events and mouse position of every frame,
+# timestamped in microseconds since recording started, as gzipped JSON lines.
+# The first line is a header with what's needed to rebuild the clock. The
+# stream is sync-flushed every `flush_frames` frames, so a session that
+# crashes or is killed still leaves a readable recording up to the last flush.
+class EventRecorder:
+    def __init__(self, path, header, flush_frames=60):
+        self.file = gzip.open(path, "wt")
+        self.file.write(json.dumps(dict(header, version=1)) + "\n")
+        self.file.flush()
+        self.flush_frames = flush_frames
+        self.frames = 0
+        self.start_ns = time.monotonic_ns()
+    
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, (bool, int, float, str)) or value is None:
+            return value
+        if isinstance(value, (tuple, list)) and all(isinstance(item, (int, float)) for item in value):
+            return list(value)
+        raise TypeError
+    
+    def encode_event(self, event):
+        # Only plain attributes survive; window handles and the like are dropped
+        attributes = {}
+        for name, value in event.dict.items():
+            try:
+                attributes[name] = self.encode_value(value)
+            except TypeError:
+                pass
+        return [event.type, attributes]
+    
+    def record(self, mouse_pos, events):
+        line = {"t": (time.monotonic_ns() - self.start_ns) // 1000, "m": list(mouse_pos)}
+        if events:
+            line["e"] = [self.encode_event(event) for event in events]
+        self.file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.frames += 1
+        if self.frames % self.flush_frames == 0:
+            # GzipFile.flush() ends the block with Z_SYNC_FLUSH
+            self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
+def read_recording(path):
+    # Returns the header and an iterator of (microseconds, mouse_pos, events)
+    file = gzip.open(path, "rt")
+    header = json.loads(file.readline())
+    
+    def frames():
+        with file:
+            while True:
+                # A recording that wasn't closed ends after its last flush,
+                # possibly in the middle of a line
+                try:
+                    line = file.readline()
+                    frame = json.loads(line) if line.endswith("\n") else None
+                except (EOFError, zlib.error, ValueError):
+                    frame = None
+                if frame is None:
+                    return
+                events = [pygame.event.Event(event_type, {name: tuple(value) if isinstance(value, list) else value
+                                                          for name, value in attributes.items()})
+                          for event_type, attributes in frame.get("e", ())]
+                yield frame["t"], tuple(frame["m"]), events
+    return header, frames()
+
+# Jitter statistics for frame presentation: the spread of the intervals
+# between presents around the target period and, if given, the error
+# between the time the clock was drawn for and when it was actually shown.
+def pacing_stats(intervals_ns, period_ns, errors_ns=()):
+    if not intervals_ns:
+        return {}
+    count = len(intervals_ns)
+    mean = sum(intervals_ns) / count
+    deviations = summarize([abs(interval - period_ns) for interval in intervals_ns], 1e-6)
+    stats = {
+        "interval_mean_ms": mean / 1e6,
+        "interval_stdev_ms": math.sqrt(sum((interval - mean) ** 2 for interval in intervals_ns) / count) / 1e6,
+        "deviation_p50_ms": deviations["p50_ms"],
+        "deviation_p99_ms": deviations["p99_ms"],
+        "deviation_max_ms": deviations["max_ms"],
+    }
+    if errors_ns:
+        errors = summarize([abs(error) for error in errors_ns], 1e-6)
+        stats["present_error_mean_ms"] = errors["mean_ms"]
+        stats["present_error_p99_ms"] = errors["p99_ms"]
+    return stats
+
+# Deadline-based frame pacing. clock.tick() sleeps in whole milliseconds and
+# the OS wakes it late by a millisecond or more, so frame intervals wander by
+# several milliseconds. The pacer instead sleeps until shortly before each
+# deadline and spins the rest of the way, starting the spin as early as sleep
+# has recently been overshooting. Deadlines are a period apart; a late frame
+# is shown as soon as it is ready and the following ones pace from it.
+#
+# With vsync the buffer swap itself waits for the refresh, so the pacer only
+# predicts when it will happen (a period after the previous swap). If swaps
+# keep returning much sooner than that the request was ignored, and the pacer
+# goes back to timing frames itself.
+class FramePacer:
+    def __init__(self, fps=60, spin=0.002, vsync=False, history=120):
+        self.period_ns = round(1000000000 / fps)
+        self.min_spin_ns = round(spin * 1000000000)
+        self.spin_ns = self.min_spin_ns
+        # How late recent sleeps woke up, in nanoseconds
+        self.oversleeps = deque(maxlen=history)
+        self.vsync = vsync
+        self.deadline_ns = None
+        self.last_swap_ns = None
+        self.early_swaps = 0
+    
+    def next_deadline(self):
+        # Monotonic nanoseconds at which the frame about to be built will be shown
+        now = time.monotonic_ns()
+        if self.vsync and self.last_swap_ns is not None:
+            self.deadline_ns = max(self.last_swap_ns + self.period_ns, now)
+        elif self.deadline_ns is None:
+            self.deadline_ns = now + self.period_ns
+        else:
+            self.deadline_ns += self.period_ns
+            if self.deadline_ns < now:
+                # Already late: waiting for the next slot would double the gap
+                self.deadline_ns = now
+        return self.deadline_ns
+    
+    def wait(self):
+        # Block until the deadline, right before presenting
+        if self.vsync:
+            return
+        wake_ns = self.deadline_ns - self.spin_ns
+        remaining = wake_ns - time.monotonic_ns()
+        if remaining > 0:
+            time.sleep(remaining / 1e9)
+            self.oversleeps.append(max(0, time.monotonic_ns() - wake_ns))
+            self.adapt()
+        while time.monotonic_ns() < self.deadline_ns:
+            pass
+    
+    def adapt(self):
+        # Spin for as long as the 95th percentile oversleep, plus half a
+        # millisecond, but never less than `spin` or more than half a period
+        oversleep = percentile(sorted(self.oversleeps), 0.95)
+        self.spin_ns = min(self.period_ns // 2, max(self.min_spin_ns, oversleep + 500000))
+    
+    def presented(self, ns):
+        if self.vsync:
+            if self.last_swap_ns is not None and ns - self.last_swap_ns < self.period_ns // 2:
+                self.early_swaps += 1
+                if self.early_swaps >= 3:
+                    self.vsync = False
+                    self.deadline_ns = ns
+            else:
+                self.early_swaps = 0
+        self.last_swap_ns = ns
+
+# Picks how often the main loop wakes up. At full rate it ticks at the target
+# FPS; unfocused windows tick slower; with animation off the loop sleeps until
+# the next second boundary; minimized windows are not drawn at all. Sleeping
+# policies block in pygame.event.wait, so input wakes the loop immediately.
+class FrameScheduler:
+    POLICY_FPS = {
+        "full-rate": 60,
+        "unfocused": 30,
+        "low-power": 1,
+        "minimized": 1,
+    }
+    
+    def __init__(self, fps=60, low_power=False, clock=None, pacing="tick", vsync=False, history=600):
+        self.fps = fps
+        self.low_power = low_power
+        self.focused = True
+        self.minimized = False
+        self.policy = "full-rate"
+        self.effective_fps = 0.0
+        self.clock = clock or pygame.time.Clock()
+        self.last_wake = None
+        self.choose_policy()
+        
+        # "precise" paces full-rate frames with a FramePacer instead of
+        # clock.tick(); the other policies aren't about smooth motion
+        self.pacing = pacing
+        self.pacer = FramePacer(fps, vsync=vsync) if pacing == "precise" else None
+        
+        # Intervals between presents, and how far each present was from the
+        # time the clock was drawn for
+        self.present_intervals = deque(maxlen=history)
+        self.present_errors = deque(maxlen=history)
+        self.last_present_ns = None
+        self.sample_ns = None
+    
+    @property
+    def paced(self):
+        return self.pacer is not None and self.policy == "full-rate"
+    
+    @property
+    def visible(self):
+        return not self.minimized
+    
+    @property
+    def interval(self):
+        # Seconds each frame is meant to take under the current policy
+        if self.policy == "full-rate":
+            return 1 / self.fps
+        return 1 / min(self.fps, self.POLICY_FPS[self.policy])
+    
+    @property
+    def sleeping(self):
+        # Policies that wait for the next second or for input rather than tick
+        return self.policy in ("low-power", "minimized")
+    
+    def choose_policy(self):
+        if self.minimized:
+            self.policy = "minimized"
+        elif self.low_power:
+            self.policy = "low-power"
+        elif not self.focused:
+            self.policy = "unfocused"
+        else:
+            self.policy = "full-rate"
+    
+    def handle_event(self, event):
+        if event.type == pygame.WINDOWFOCUSLOST:
+            self.focused = False
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.focused = True
+        elif event.type in (pygame.WINDOWMINIMIZED, pygame.WINDOWHIDDEN):
+            self.minimized = True
+        elif event.type in (pygame.WINDOWRESTORED, pygame.WINDOWSHOWN, pygame.WINDOWMAXIMIZED):
+            self.minimized = False
+        else:
+            return
+        self.choose_policy()
+        # Frames resume from scratch; the gap isn't jitter
+        self.last_present_ns = None
+        if self.pacer is not None:
+            self.pacer.deadline_ns = None
+            self.pacer.last_swap_ns = None
+    
+    def present_time(self):
+        # Monotonic time the next frame will be shown at, to draw the clock
+        # for; None when unpaced, where the clock just uses the current time
+        if self.paced:
+            self.sample_ns = self.pacer.next_deadline()
+            return self.sample_ns
+        self.sample_ns = time.monotonic_ns()
+        return None
+    
+    def pace(self):
+        # Right before presenting
+        if self.paced:
+            self.pacer.wait()
+    
+    def presented(self):
+        # Right after presenting
+        now = time.monotonic_ns()
+        if self.last_present_ns is not None:
+            self.present_intervals.append(now - self.last_present_ns)
+        self.last_present_ns = now
+        if self.sample_ns is not None:
+            self.present_errors.append(now - self.sample_ns)
+        if self.paced:
+            self.pacer.presented(now)
+    
+    def jitter(self):
+        return pacing_stats(self.present_intervals, round(1000000000 / self.fps), self.present_errors)
+    
+    def wait(self, astrological_clock):
+        # Sleep until the next frame is due; returns any event that ended the sleep
+        woken = []
+        if self.policy == "full-rate":
+            # When paced, the pacer has already waited before presenting
+            if not self.paced:
+                self.clock.tick(self.fps)
+        elif self.policy == "unfocused":
+            self.clock.tick(min(self.fps, self.POLICY_FPS["unfocused"]))
+        else:
+            if self.policy == "low-power":
+                timeout = astrological_clock.seconds_to_next_second()
+            else:
+                timeout = 1 / self.POLICY_FPS["minimized"]
+            event = pygame.event.wait(max(1, int(timeout * 1000) + 1))
+            if event.type != pygame.NOEVENT:
+                woken.append(event)
+        self.woke()
+        return woken
+    
+    def timeout(self, astrological_clock, frame_start):
+        # Seconds the render thread of the threaded loop sleeps after a frame
+        # that started at perf_counter() `frame_start`; input cuts it short
+        now = time.perf_counter()
+        if self.policy == "full-rate":
+            return 0.0 if self.paced else max(0.0, frame_start + 1 / self.fps - now)
+        if self.policy == "unfocused":
+            return max(0.0, frame_start + 1 / min(self.fps, self.POLICY_FPS["unfocused"]) - now)
+        if self.policy == "low-power":
+            return astrological_clock.seconds_to_next_second()
+        return 1 / self.POLICY_FPS["minimized"]
+    
+    def woke(self):
+        # Smoothed rate at which frames are actually being produced
+        now = time.perf_counter()
+        if self.last_wake is not None:
+            fps = 1 / max(now - self.last_wake, 1e-6)
+            self.effective_fps = fps if self.effective_fps == 0 else self.effective_fps * 0.9 + fps * 0.1
+        self.last_wake = now
+
+# Click-to-photon and keypress-to-display latency: from a mouse click or key
+# press to the end of the first present that shows its effect. pygame doesn't
+# expose SDL's event timestamps, so inputs are stamped when the loop reads
+# them, which leaves out the time they waited in the event queue (most of the
+# serial loop's latency). Events carrying their own `sent_ns` (monotonic
+# nanoseconds), as the benchmark's injected ones do, are measured from then.
+class InputLatency:
+    KINDS = {pygame.MOUSEBUTTONDOWN: "click", pygame.KEYDOWN: "key"}
+    
+    def __init__(self, history=600):
+        self.samples = {kind: deque(maxlen=history) for kind in self.KINDS.values()}
+    
+    def stamp(self, event):
+        # (kind, monotonic ns) for a click or key press, else None
+        kind = self.KINDS.get(event.type)
+        if kind is None:
+            return None
+        return kind, event.dict.get("sent_ns") or time.monotonic_ns()
+    
+    def presented(self, inputs):
+        # After the present that shows `inputs`
+        now = time.monotonic_ns()
+        for kind, stamped_ns in inputs:
+            self.samples[kind].append(now - stamped_ns)
+    
+    def stats(self):
+        stats = {}
+        for kind, samples in self.samples.items():
+            if samples:
+                stats[kind] = summarize(samples, 1e-6)
+        return stats
+
+# The main loop: input, clock update, drawing and presenting. SerialLoop runs
+# them one after the other; ThreadedLoop reads input and updates the clock on
+# the main thread while a render thread draws the previous snapshot.
+class MainLoop:
+    def __init__(self, window, target, scheduler, rebuilder, theme_watcher=None, profiler=None, recorder=None,
+                 latency=None, startup_report=False):
+        self.window = window
+        # What the clock is drawn on
+        self.surface = window
+        self.target = target
+        self.scheduler = scheduler
+        self.rebuilder = rebuilder
+        self.theme_watcher = theme_watcher
+        self.profiler = profiler
+        self.recorder = recorder
+        self.latency = latency
+        self.startup_report = startup_report
+        self.running = True
+        self.full_flip = False
+        self.prof = None
+    
+    def begin_frame(self):
+        # The profiler can be switched on or off by an event mid-frame; marks
+        # only go to one that was on when the frame began
+        profiler = self.profiler
+        self.prof = profiler if profiler is not None and profiler.enabled else None
+        if self.prof:
+            self.prof.begin_frame()
+    
+    def mark(self, name):
+        if self.prof:
+            self.prof.mark(name)
+    
+    def handle_input(self, events):
+        # The clock's share of the events; returns the stamped clicks and key presses
+        inputs = []
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.running = False
+            self.target.handle_event(event)
+            if self.latency is not None:
+                stamp = self.latency.stamp(event)
+                if stamp is not None:
+                    inputs.append(stamp)
+        return inputs
+    
+    def handle_render_event(self, event):
+        # The renderer's share: window state, resizes, profiler keys and the scheduler
+        if event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            self.target.request_full_redraw()
+        elif event.type == pygame.VIDEORESIZE:
+            self.resize()
+        if self.profiler is not None:
+            self.profiler.handle_event(event)
+        self.scheduler.handle_event(event)
+    
+    def resize(self):
+        # The old layout keeps drawing in its old place until the rebuilt one
+        # is swapped in
+        self.window = self.surface = pygame.display.get_surface()
+        self.window.fill(app.theme.black)
+        self.target.request_full_redraw()
+        self.rebuilder.request(self.window.get_rect())
+        self.full_flip = True
+    
+    def poll_rebuild(self):
+        if self.theme_watcher is not None and self.theme_watcher.poll():
+            self.rebuilder.request(theme_path=self.theme_watcher.path)
+        if self.rebuilder.poll():
+            self.surface.fill(app.theme.black)
+            self.full_flip = True
+    
+    def show(self, dirty):
+        if dirty is None or self.full_flip:
+            pygame.display.flip()
+            self.full_flip = False
+        else:
+            pygame.display.update(dirty)
+    
+    def present(self, dirty, inputs):
+        self.scheduler.pace()
+        self.mark("pace")
+        self.show(dirty)
+        self.scheduler.presented()
+        if inputs:
+            self.latency.presented(inputs)
+        self.mark("present")
+        
+        if app.first_frame() and self.startup_report:
+            for name, ms in app.report().items():
+                print(f"startup {name:<20} {ms:8.1f} ms", file=sys.stderr)
+
+# Events, update, draw and present in turn. Input that arrives while a frame
+# is being drawn or the loop is sleeping waits for the next iteration.
+class SerialLoop(MainLoop):
+    def run(self):
+        pending_events = []
+        while self.running:
+            self.begin_frame()
+            
+            mouse_pos = pygame.mouse.get_pos()
+            events = pending_events + pygame.event.get()
+            inputs = self.handle_input(events)
+            for event in events:
+                self.handle_render_event(event)
+            self.mark("events")
+            
+            self.poll_rebuild()
+            if self.recorder:
+                self.recorder.record(mouse_pos, events)
+            
+            # Update clock state, for the time the frame will be shown at
+            self.target.update(mouse_pos, self.scheduler.present_time())
+            self.mark("update")
+            
+            # Draw everything; nothing to show while minimized
+            if self.scheduler.visible:
+                dirty = self.target.draw(self.surface)
+                self.mark("draw")
+                self.present(dirty, inputs)
+            
+            pending_events = self.scheduler.wait(self.target)
+            self.mark("tick")
+
+# Hand-over between the two threads of ThreadedLoop. The render thread asks
+# for a frame to be shown at a given time and waits for its snapshot, which
+# the input thread makes by updating the clock for that time. Events go the
+# other way for the renderer's share of them; clicks and key presses also
+# wake a render thread sleeping between frames, so their frame goes out
+# straight away instead of at the next tick.
+class SnapshotChannel:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.requested = 0
+        self.present_ns = None
+        self.published = 0
+        self.snapshot = None
+        self.inputs = ()
+        self.events = []
+        self.woken = False
+        self.closed = False
+    
+    def request(self, present_ns):
+        # Render thread: (snapshot, inputs) for a frame shown at present_ns
+        # (None: now), or None once the channel is closed
+        with self.condition:
+            self.requested += 1
+            self.present_ns = present_ns
+            self.condition.notify_all()
+            self.condition.wait_for(lambda: self.published == self.requested or self.closed)
+            if self.closed:
+                return None
+            return self.snapshot, self.inputs
+    
+    def wait_request(self, timeout):
+        # Input thread: (frame, present_ns) of a request to answer, or None
+        # if none came within `timeout` seconds
+        with self.condition:
+            self.condition.wait_for(lambda: self.published < self.requested or self.closed, timeout)
+            if self.published < self.requested:
+                return self.requested, self.present_ns
+            return None
+    
+    def publish(self, frame, snapshot, inputs):
+        with self.condition:
+            self.published = frame
+            self.snapshot = snapshot
+            self.inputs = inputs
+            self.condition.notify_all()
+    
+    def forward(self, events, wake=False):
+        with self.condition:
+            self.events += events
+            if wake:
+                self.woken = True
+                self.condition.notify_all()
+    
+    def take_events(self):
+        with self.condition:
+            events, self.events = self.events, []
+            return events
+    
+    def sleep(self, timeout):
+        # Render thread, between frames: until the timeout or new input
+        with self.condition:
+            self.condition.wait_for(lambda: self.woken or self.closed, timeout)
+            self.woken = False
+    
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+# Input and simulation on the main thread (SDL wants events pumped on the
+# thread that opened the window), drawing and presenting on a render thread.
+# Events are handled as they arrive, a few hundred times a second, rather
+# than once a frame, and each frame draws an immutable ClockSnapshot made for
+# the time it will be shown, so a slow draw no longer holds up input. The
+# clock is drawn to an offscreen canvas; the display lock covers only event
+# pumping and the copy to the window, as a resize during the pump replaces
+# the window surface.
+#
+# Under the sleeping policies (low power, minimized) the input thread blocks
+# in pygame.event.wait instead of polling, holding the display lock; the
+# render thread posts a WAKE event when it needs a frame or the display.
+#
+# Opt-in only: SDL supports window surface calls (get_surface, flip, update)
+# only on the thread that created the window, and on one CPU the latency gain
+# disappears under heavy draws.
+class ThreadedLoop(MainLoop):
+    WAKE = pygame.event.custom_type()
+    
+    def __init__(self, *args, poll_interval=0.002, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.poll_interval = poll_interval
+        self.channel = SnapshotChannel()
+        self.display_lock = threading.Lock()
+        # Held while handling events and updating, and by the render thread
+        # while it swaps in a rebuilt layout
+        self.state_lock = threading.Lock()
+        self.surface = self.canvas = self.new_canvas()
+        self.error = None
+        # Each thread sets its flag before checking the other's, so either
+        # the input thread doesn't block or the render thread wakes it
+        self.input_blocked = False
+        self.render_waiting = False
+    
+    def new_canvas(self):
+        canvas = new_surface(self.window.get_size())
+        canvas.fill(app.theme.black)
+        return canvas
+    
+    @contextmanager
+    def waking_input(self):
+        # Render thread, around anything that waits on the input thread
+        self.render_waiting = True
+        if self.input_blocked:
+            pygame.event.post(pygame.event.Event(self.WAKE))
+        try:
+            yield
+        finally:
+            self.render_waiting = False
+    
+    def resize(self):
+        with self.waking_input(), self.display_lock:
+            super().resize()
+        self.surface = self.canvas = self.new_canvas()
+    
+    def show(self, dirty):
+        with self.waking_input(), self.display_lock:
+            if dirty is None or self.full_flip:
+                self.window.blit(self.canvas, (0, 0))
+                pygame.display.flip()
+                self.full_flip = False
+            else:
+                for rect in dirty:
+                    self.window.blit(self.canvas, rect, rect)
+                pygame.display.update(dirty)
+    
+    def read_events(self):
+        # Input thread: (frame request or None, mouse position, events)
+        if not self.scheduler.sleeping:
+            request = self.channel.wait_request(self.poll_interval)
+            with self.display_lock:
+                return request, pygame.mouse.get_pos(), pygame.event.get()
+        
+        self.input_blocked = True
+        try:
+            with self.display_lock:
+                if self.render_waiting or self.channel.wait_request(0) is not None:
+                    events = pygame.event.get()
+                else:
+                    timeout = self.scheduler.timeout(self.target, time.perf_counter())
+                    event = pygame.event.wait(max(1, int(timeout * 1000) + 1))
+                    events = [] if event.type == pygame.NOEVENT else [event] + pygame.event.get()
+                mouse_pos = pygame.mouse.get_pos()
+        finally:
+            self.input_blocked = False
+        return (self.channel.wait_request(0), mouse_pos,
+                [event for event in events if event.type != self.WAKE])
+    
+    def run(self):
+        # A thread holding the GIL is only asked to let go every switch
+        # interval (5 ms by default), which would add that much to input
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(0.001)
+        renderer = threading.Thread(target=self.render, name="render", daemon=True)
+        renderer.start()
+        inputs = []
+        recorded_events = []
+        mouse_pos = pygame.mouse.get_pos()
+        try:
+            while self.running:
+                request, mouse_pos, events = self.read_events()
+                with self.state_lock:
+                    new_inputs = self.handle_input(events)
+                    inputs += new_inputs
+                    if self.recorder:
+                        recorded_events += events
+                    if request is not None:
+                        # One recorded line per frame, as replay.py draws them
+                        if self.recorder:
+                            self.recorder.record(mouse_pos, recorded_events)
+                            recorded_events = []
+                        frame, present_ns = request
+                        self.target.update(mouse_pos, present_ns)
+                        self.channel.publish(frame, self.target.snapshot(), inputs)
+                        inputs = []
+                if events:
+                    self.channel.forward(events, wake=bool(new_inputs))
+        finally:
+            self.channel.close()
+            renderer.join()
+            sys.setswitchinterval(switch_interval)
+            # Events of the last iteration, QUIT among them, had no frame to go with
+            if self.recorder and recorded_events:
+                self.recorder.record(mouse_pos, recorded_events)
+        if self.error is not None:
+            raise self.error
+    
+    def render(self):
+        try:
+            while self.running:
+                frame_start = time.perf_counter()
+                self.begin_frame()
+                for event in self.channel.take_events():
+                    self.handle_render_event(event)
+                self.mark("events")
+                
+                with self.state_lock:
+                    self.poll_rebuild()
+                with self.waking_input():
+                    frame = self.channel.request(self.scheduler.present_time())
+                if frame is None:
+                    break
+                snapshot, inputs = frame
+                # Time spent waiting on the input thread for the snapshot
+                self.mark("update")
+                
+                if self.scheduler.visible:
+                    dirty = self.target.draw(self.surface, snapshot)
+                    self.mark("draw")
+                    self.present(dirty, inputs)
+                
+                self.channel.sleep(self.scheduler.timeout(self.target, frame_start))
+                self.scheduler.woke()
+                self.mark("tick")
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.running = False
+
+LOOPS = {"serial": SerialLoop, "threaded": ThreadedLoop}
+
+app.phases["import"] = time.perf_counter() - import_started
+
+# Frame size arguments of the headless tools, e.g. "1920x1080"
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def positive_float(text):
+    value = float(text)
+    if not (value > 0 and math.isfinite(value)):
+        raise argparse.ArgumentTypeError(f"must be a positive number: {text}")
+    return value
+
+def non_negative_int(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {text}")
+    return value
+
+def parse_offsets(text):
+    # "0,-5,9" -> [0.0, -5.0, 9.0], for --grid and recordings of it
+    try:
+        offsets = [float(offset) for offset in text.split(",")]
+    except ValueError:
+        offsets = None
+    if not offsets or not all(math.isfinite(offset) for offset in offsets):
+        raise argparse.ArgumentTypeError(f"expected comma-separated hours, e.g. 0,-5,9: {text!r}")
+    return offsets
+
 # Main function
 def main():
+    parser = argparse.ArgumentParser(description="Reloj Astrológico Interactivo")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only push the changed screen regions instead of flipping the whole window")
+    parser.add_argument("--particles", type=non_negative_int, default=12,
+                        help="number of particles orbiting the central decoration")
+    parser.add_argument("--fps", type=int, default=60, help="frame rate while focused")
+    parser.add_argument("--pacing", choices=("tick", "precise"), default="tick",
+                        help="frame pacing: pygame's clock.tick(), or sleep-then-spin to exact deadlines"
+                             " with the hands drawn for the moment the frame is shown")
+    parser.add_argument("--loop", choices=sorted(LOOPS), default="serial",
+                        help="handle input and draw in turn, or (experimental) draw on a separate thread, which can"
+                             " lower input latency under light load; SDL only supports window calls from the thread"
+                             " that created it, so this is unsupported on macOS and may misbehave elsewhere")
+    parser.add_argument("--vsync", action="store_true",
+                        help="ask for vsync and pace frames at the display refresh rate")
+    parser.add_argument("--speed", type=positive_float, default=1.0,
+                        help="time-warp multiplier, e.g. 1440 sweeps 24 hours in a minute")
+    parser.add_argument("--highlight", default="Leo",
+                        help="comma-separated signs the hour hand highlights, or 'all'")
+    parser.add_argument("--signs", choices=SIGN_MODES, default="hour",
+                        help="highlight the sign under the hour hand, the Sun's sign, or the Sun's and the Moon's")
+    parser.add_argument("--grid", metavar="OFFSETS", type=parse_offsets,
+                        help="world clock: comma-separated time zone offsets in hours, one clock each, e.g. 0,-5,1,9")
+    parser.add_argument("--resizable", action="store_true",
+                        help="resizable window; the clock is re-laid out to fit")
+    parser.add_argument("--fullscreen", action="store_true",
+                        help="fullscreen at the desktop resolution, with the clock scaled to fit")
+    parser.add_argument("--low-power", action="store_true",
+                        help="turn off flame and decoration animation and only wake once a second")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record events and mouse positions to PATH (gzipped JSON lines) for replay.py")
+    parser.add_argument("--profile", action="store_true",
+                        help="start with the frame profiler enabled (F2 toggles it, F3 shows the overlay)")
+    parser.add_argument("--profile-out", metavar="PATH",
+                        help="periodically write profiler snapshots to PATH (.csv or .json)")
+    parser.add_argument("--profile-interval", type=float, default=5.0,
+                        help="seconds between profiler snapshots")
+    parser.add_argument("--theme", metavar="PATH", default="theme.json",
+                        help="JSON theme file (colors, radii, font, zodiac images); reloaded live when it changes")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print how long each startup phase took once the first frame is shown")
+    args = parser.parse_args()
+    
     # Create assets directory structure if it doesn't exist
     os.makedirs("assets/zodiac", exist_ok=True)
     os.makedirs("assets/fonts", exist_ok=True)
+    app.load_theme(args.theme)
+    
+    # The layout follows the window, so a fullscreen 4K display gets a clock
+    # drawn natively at 4K rather than a small one or a scaled-up frame
+    if args.fullscreen:
+        window = app.init_display((0, 0), pygame.FULLSCREEN, vsync=args.vsync)
+    elif args.resizable:
+        window = app.init_display((WIDTH, HEIGHT), pygame.RESIZABLE, vsync=args.vsync)
+    else:
+        window = app.init_display((WIDTH, HEIGHT), vsync=args.vsync)
     
     # Initialize clock - it starts with system time by default
-    astrological_clock = AstrologicalClock()
+    highlight = None if args.highlight == "all" else args.highlight.split(",")
+    with app.phase("clock"):
+        if args.grid:
+            astrological_clock = WorldClockGrid(args.grid,
+                                                rect=window.get_rect(), dirty_rects=args.dirty_rects,
+                                                particle_count=args.particles, animate=not args.low_power,
+                                                highlight=highlight, speed=args.speed, sign_mode=args.signs)
+        else:
+            astrological_clock = AstrologicalClock(dirty_rects=args.dirty_rects, particle_count=args.particles,
+                                                   animate=not args.low_power,
+                                                   time_engine=TimeEngine(speed=args.speed), highlight=highlight,
+                                                   layout=ClockLayout(window.get_rect()), sign_mode=args.signs)
+    rebuilder = LayoutRebuilder(astrological_clock)
+    theme_watcher = ThemeWatcher(args.theme)
+    scheduler = FrameScheduler(fps=app.refresh_rate(args.fps) if app.vsync else args.fps,
+                               low_power=args.low_power, clock=app.clock, pacing=args.pacing, vsync=app.vsync)
     
-    pygame.display.set_caption("Reloj Astrológico Interactivo")
+    profiler = FrameProfiler(output_path=args.profile_out, snapshot_interval=args.profile_interval)
+    profiler.set_enabled(args.profile)
+    profiler.attach(astrological_clock)
+    profiler.scheduler = scheduler
     
-    # Main game loop
-    running = True
-    while running:
-        # Get current mouse position
-        mouse_pos = pygame.mouse.get_pos()
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            
-            # Pass events to the clock for UI handling
-            astrological_clock.handle_event(event)
-        
-        # Update clock state
-        astrological_clock.update(mouse_pos)
-        
-        # Draw everything
-        astrological_clock.draw(screen)
-        
-        pygame.display.flip()
-        clock.tick(60)
+    recorder = None
+    if args.record:
+        # The clock time at the start of the recording anchors the replay
+        start = datetime.datetime.now() if args.grid else astrological_clock.time_engine.now()
+        recorder = EventRecorder(args.record, {
+            "start": start.isoformat(),
+            "speed": args.speed,
+            "size": list(window.get_size()),
+            "particles": args.particles,
+            "highlight": args.highlight,
+            "animate": not args.low_power,
+            "grid": ",".join(map(str, args.grid)) if args.grid else None,
+            "signs": args.signs,
+            "theme": args.theme,
+        })
+    
+    latency = InputLatency()
+    profiler.latency = latency
+    loop = LOOPS[args.loop](window, astrological_clock, scheduler, rebuilder, theme_watcher, profiler, recorder,
+                            latency, args.startup_report)
+    try:
+        loop.run()
+    finally:
+        if profiler.enabled and profiler.output_path:
+            profiler.write_snapshot()
+        if recorder:
+            recorder.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,121 @@
+# Replays a session recorded with `python main.py --record session.jsonl.gz`.
+#
+# Rebuilds the clock from the recording's header and feeds every frame's
+# events and mouse position back through handle_event()/update()/draw(), on a
+# manual clock advanced to each frame's recorded timestamp, so two builds can
+# be profiled on exactly the same session.
+#
+#   python replay.py session.jsonl.gz                     # timing summary
+#   python replay.py session.jsonl.gz --checksums a.txt   # per-frame checksums
+#   python replay.py session.jsonl.gz --compare a.txt     # first frame that differs
+import sys
+import json
+import time
+import zlib
+import argparse
+import datetime
+
+import main
+import pygame
+
+def build_clock(header, source):
+    start = datetime.datetime.fromisoformat(header["start"])
+    rect = pygame.Rect(0, 0, *header["size"])
+    highlight = None if header["highlight"] == "all" else header["highlight"].split(",")
+    if header.get("grid"):
+        clock = main.WorldClockGrid(main.parse_offsets(header["grid"]), rect=rect,
+                                    particle_count=header["particles"], animate=header["animate"],
+                                    highlight=highlight, time_source=source, start=start, speed=header["speed"],
+                                    sign_mode=header.get("signs", "hour"))
+    else:
+        clock = main.AstrologicalClock(particle_count=header["particles"], animate=header["animate"],
+                                       time_engine=main.TimeEngine(source, start, header["speed"]),
+                                       highlight=highlight, layout=main.ClockLayout(rect),
+                                       sign_mode=header.get("signs", "hour"))
+    # Replays always start from the real zodiac images
+    clock.asset_loader.wait()
+    return clock
+
+def replay(path, checksums=False):
+    # Returns the frame count, per-stage timings and, if asked, one CRC-32 per frame
+    header, frames = main.read_recording(path)
+    main.app.init_display(tuple(header["size"]), headless=True)
+    # Recordings made before themes existed used the defaults
+    main.app.load_theme(header.get("theme"))
+    source = main.ManualClock()
+    clock = build_clock(header, source)
+    surface = pygame.Surface(header["size"])
+    timings = {}
+
+    def record(name, seconds):
+        timings.setdefault(name, []).append(seconds)
+
+    clock.stage_timer = record
+    frame_count = 0
+    frame_checksums = []
+    for microseconds, mouse_pos, events in frames:
+        source.ns = microseconds * 1000
+
+        frame_start = time.perf_counter()
+        for event in events:
+            if event.type == pygame.VIDEORESIZE:
+                # Re-laid out straight away; the live window does this a
+                # little later on a background thread
+                surface = pygame.Surface(event.size)
+                rect = surface.get_rect()
+                clock.apply_layouts(rect, clock.layouts_for(rect))
+            clock.handle_event(event)
+        events_end = time.perf_counter()
+        clock.update(mouse_pos)
+        update_end = time.perf_counter()
+        clock.draw(surface)
+        frame_end = time.perf_counter()
+
+        record("events", events_end - frame_start)
+        record("update", update_end - events_end)
+        record("frame", frame_end - frame_start)
+        frame_count += 1
+        if checksums:
+            frame_checksums.append(zlib.crc32(pygame.image.tobytes(surface, "RGB")))
+
+    return frame_count, {name: main.summarize(samples) for name, samples in timings.items()}, frame_checksums
+
+def main_replay():
+    parser = argparse.ArgumentParser(description="Replay a recorded astrological clock session")
+    parser.add_argument("recording", help="file written by main.py --record")
+    parser.add_argument("--checksums", metavar="PATH", help="write one CRC-32 of the rendered frame per line")
+    parser.add_argument("--compare", metavar="PATH", help="compare frame checksums against an earlier --checksums file")
+    parser.add_argument("--json", metavar="PATH", help="write the timings as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    frame_count, timings, checksums = replay(args.recording, checksums=bool(args.checksums or args.compare))
+    if args.json == "-":
+        json.dump(timings, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"{args.recording}: {frame_count} frames")
+        for name, stats in timings.items():
+            print(f"  {name:<11} mean {stats['mean_ms']:7.3f} ms  p50 {stats['p50_ms']:7.3f} ms"
+                  f"  p99 {stats['p99_ms']:7.3f} ms")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(timings, f, indent=2)
+
+    if args.checksums:
+        with open(args.checksums, "w") as f:
+            f.writelines(f"{checksum:08x}\n" for checksum in checksums)
+    if args.compare:
+        with open(args.compare) as f:
+            expected = [int(line, 16) for line in f if line.strip()]
+        for index, (got, want) in enumerate(zip(checksums, expected)):
+            if got != want:
+                print(f"frame {index} differs: {got:08x} != {want:08x}", file=sys.stderr)
+                return 1
+        if len(checksums) != len(expected):
+            print(f"frame count differs: {len(checksums)} != {len(expected)}", file=sys.stderr)
+            return 1
+        print(f"all {len(checksums)} frames match", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_replay())
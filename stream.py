@@ -0,0 +1,390 @@
+# Frame-streaming server for the astrological clock.
+#
+# Renders AstrologicalClock once, headless, and serves it as MJPEG over HTTP
+# to any number of local viewers, instead of every lobby screen running its
+# own copy of main.py. Each changed frame is encoded once and the same bytes
+# go to every client; a frame whose pixels hash the same as the previous one
+# isn't encoded or sent again.
+#
+#   python stream.py --port 8080        # open http://127.0.0.1:8080/
+#   python stream.py --duration 20 --clients 50 --slow-clients 5   # loopback load test
+#
+# Endpoints: / (a page showing the stream), /stream.mjpg, /frame.jpg (the
+# latest frame) and /stats (JSON). Clients never hold up rendering: each one
+# is sent the newest frame whenever it's ready for another, so a slow viewer
+# skips frames rather than queueing them. A frame only counts as taken when
+# the socket can accept it: send buffers are kept small and a frame that
+# arrives while the previous one is still waiting in the buffer is dropped.
+import io
+import sys
+import json
+import time
+import zlib
+import select
+import socket
+import argparse
+import threading
+import http.client
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import main
+import pygame
+
+BOUNDARY = b"frame"
+
+# Kernel send buffer per stream client (Linux doubles it). The default lets a
+# slow viewer queue seconds of frames behind the one it's reading.
+SEND_BUFFER = 16 * 1024
+CONTENT_TYPES = {"jpeg": "image/jpeg", "png": "image/png"}
+
+# The newest encoded frame, with a sequence number. Publishing replaces it
+# and wakes the clients; nothing is queued, so publishing never blocks.
+class FrameChannel:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None  # (sequence, data, published_ns)
+        self.closed = False
+
+    def publish(self, data):
+        with self.condition:
+            sequence = self.frame[0] + 1 if self.frame else 1
+            self.frame = (sequence, data, time.monotonic_ns())
+            self.condition.notify_all()
+
+    def latest(self):
+        return self.frame
+
+    def next_after(self, sequence, timeout=None):
+        # Waits for a frame newer than `sequence`; None once closed
+        with self.condition:
+            self.condition.wait_for(lambda: self.closed or (self.frame and self.frame[0] > sequence), timeout)
+            if self.closed:
+                return None
+            return self.frame
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+# Counters and timings shared by the render loop and the client threads
+class StreamStats:
+    def __init__(self, history=600):
+        self.lock = threading.Lock()
+        self.encode_times = deque(maxlen=history)
+        self.fanout_times = deque(maxlen=history * 4)
+        self.frames_rendered = 0
+        self.frames_encoded = 0
+        self.frames_unchanged = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.clients = 0
+        self.peak_clients = 0
+
+    def rendered(self, encode_seconds=None):
+        with self.lock:
+            self.frames_rendered += 1
+            if encode_seconds is None:
+                self.frames_unchanged += 1
+            else:
+                self.frames_encoded += 1
+                self.encode_times.append(encode_seconds)
+
+    def connected(self, change):
+        with self.lock:
+            self.clients += change
+            self.peak_clients = max(self.peak_clients, self.clients)
+
+    def sent(self, size):
+        with self.lock:
+            self.frames_sent += 1
+            self.bytes_sent += size
+
+    def dropped(self, count):
+        with self.lock:
+            self.frames_dropped += count
+
+    def received(self, fanout_seconds):
+        # From publishing to a (loopback) viewer having read the whole frame
+        with self.lock:
+            self.fanout_times.append(fanout_seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "clients": self.clients,
+                "peak_clients": self.peak_clients,
+                "frames_rendered": self.frames_rendered,
+                "frames_encoded": self.frames_encoded,
+                "frames_unchanged": self.frames_unchanged,
+                "frames_sent": self.frames_sent,
+                "frames_dropped": self.frames_dropped,
+                "bytes_sent": self.bytes_sent,
+                "encode": main.summarize(self.encode_times) if self.encode_times else None,
+                "fanout": main.summarize(self.fanout_times) if self.fanout_times else None,
+            }
+
+class StreamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/":
+            self.send_body(b'<html><body style="margin:0;background:#000">'
+                           b'<img src="/stream.mjpg" style="display:block;margin:auto;max-height:100vh">'
+                           b'</body></html>', "text/html")
+        elif self.path == "/stream.mjpg":
+            self.send_stream()
+        elif self.path == "/frame.jpg":
+            frame = self.server.channel.latest()
+            if frame is None:
+                self.send_error(503, "no frame rendered yet")
+            else:
+                self.send_body(frame[1], self.server.content_type)
+        elif self.path == "/stats":
+            self.send_body(json.dumps(self.server.stats.snapshot()).encode(), "application/json")
+        else:
+            self.send_error(404)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self):
+        channel, stats = self.server.channel, self.server.stats
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=" + BOUNDARY.decode())
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        part_header = b"--" + BOUNDARY + b"\r\nContent-Type: " + self.server.content_type.encode() + b"\r\n"
+
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+
+        stats.connected(1)
+        sequence = 0
+        try:
+            while True:
+                frame = channel.next_after(sequence)
+                if frame is None:
+                    break
+                # Frames published while this client was still sending the
+                # last one are skipped, not queued
+                skipped = frame[0] - sequence - 1 if sequence else 0
+                sequence, data, published_ns = frame
+                # Nor is one the viewer hasn't made room for yet
+                if not select.select([], [self.connection], [], 0)[1]:
+                    stats.dropped(skipped + 1)
+                    continue
+                stats.dropped(skipped)
+                # Publish time on the server's monotonic clock, for loopback viewers
+                self.wfile.write(part_header + b"X-Published-Ns: %d\r\nContent-Length: %d\r\n\r\n"
+                                 % (published_ns, len(data)) + data + b"\r\n")
+                stats.sent(len(data))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stats.connected(-1)
+
+    def log_message(self, format, *args):
+        # One line per request would flood the report with stream clients
+        pass
+
+class StreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, channel, stats, content_type):
+        super().__init__(address, StreamHandler)
+        self.channel = channel
+        self.stats = stats
+        self.content_type = content_type
+
+# Reads an MJPEG stream like a viewer would, optionally slowly; for load
+# tests. Being on the same host, it can tell from a frame's publish time how
+# stale the frame is once it has been read in full. Its receive buffer is
+# kept as small as the server's send buffer: loopback would otherwise let
+# the kernel read megabytes ahead for a slow reader, which a viewer on a slow
+# link never gets.
+class LoopbackClient:
+    def __init__(self, host, port, delay=0.0, stats=None):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.stats = stats
+        self.frames = 0
+        self.latencies = []
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="loopback-client", daemon=True)
+
+    def run(self):
+        try:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=10)
+            connection.connect()
+            connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SEND_BUFFER)
+            connection.request("GET", "/stream.mjpg")
+            response = connection.getresponse()
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                if line.strip() != b"--" + BOUNDARY:
+                    continue
+                length = 0
+                published_ns = None
+                while True:
+                    header = response.readline().strip()
+                    if not header:
+                        break
+                    name, _, value = header.partition(b":")
+                    if name.lower() == b"content-length":
+                        length = int(value)
+                    elif name.lower() == b"x-published-ns":
+                        published_ns = int(value)
+                response.read(length + 2)
+                self.frames += 1
+                if published_ns is not None:
+                    latency = (time.monotonic_ns() - published_ns) / 1e9
+                    self.latencies.append(latency)
+                    if self.stats is not None:
+                        self.stats.received(latency)
+                if self.delay:
+                    time.sleep(self.delay)
+        except (OSError, http.client.HTTPException) as e:
+            self.error = e
+
+def frame_hash(surface):
+    # Straight from the pixel buffer, without a copy
+    return zlib.crc32(surface.get_buffer())
+
+def encode(surface, image_format):
+    # pygame writes to any file object; the name hint picks the format
+    with io.BytesIO() as buffer:
+        pygame.image.save(surface, buffer, "frame." + ("jpg" if image_format == "jpeg" else "png"))
+        return buffer.getvalue()
+
+def render_loop(clock, surface, channel, stats, fps, image_format, duration=0, report=None, report_interval=5.0,
+                theme_path=None):
+    # Renders, encodes and publishes frames until `duration` seconds have
+    # passed (forever for 0). Sleep-only pacing: spinning would take the CPU
+    # the client threads need. Edits to the theme file are rebuilt in the
+    # background and swapped in between frames.
+    pacer = main.FramePacer(fps, spin=0)
+    rebuilder = main.LayoutRebuilder(clock)
+    theme_watcher = main.ThemeWatcher(theme_path) if theme_path else None
+    started = time.monotonic()
+    last_report = started
+    last_hash = None
+    while not duration or time.monotonic() - started < duration:
+        # The frame goes out at the deadline, so draw the clock for then
+        present_ns = pacer.next_deadline()
+        if theme_watcher is not None and theme_watcher.poll():
+            rebuilder.request(theme_path=theme_path)
+        rebuilder.poll()
+        clock.update((-1, -1), present_ns)
+        clock.draw(surface)
+
+        digest = frame_hash(surface)
+        data = None
+        if digest != last_hash:
+            last_hash = digest
+            encode_start = time.perf_counter()
+            data = encode(surface, image_format)
+            stats.rendered(time.perf_counter() - encode_start)
+        else:
+            stats.rendered()
+
+        pacer.wait()
+        if data is not None:
+            channel.publish(data)
+
+        now = time.monotonic()
+        if report and now - last_report >= report_interval:
+            last_report = now
+            report(stats.snapshot())
+
+def print_report(snapshot, file=sys.stderr):
+    line = (f"clients {snapshot['clients']:4d}  rendered {snapshot['frames_rendered']:6d}"
+            f"  encoded {snapshot['frames_encoded']:6d}  unchanged {snapshot['frames_unchanged']:5d}"
+            f"  sent {snapshot['frames_sent']:7d}  dropped {snapshot['frames_dropped']:6d}")
+    if snapshot["encode"]:
+        line += f"  encode {snapshot['encode']['mean_ms']:6.2f}/{snapshot['encode']['p99_ms']:6.2f} ms"
+    if snapshot["fanout"]:
+        line += f"  fan-out p50 {snapshot['fanout']['p50_ms']:6.2f}  p99 {snapshot['fanout']['p99_ms']:6.2f} ms"
+    print(line, file=file)
+
+def main_stream():
+    parser = argparse.ArgumentParser(description="Serve the astrological clock as an MJPEG stream")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (0 picks a free one)")
+    parser.add_argument("--size", type=main.parse_size, default=(main.WIDTH, main.HEIGHT), help="frame size, e.g. 1920x1080")
+    parser.add_argument("--fps", type=int, default=30, help="frames rendered per second")
+    parser.add_argument("--format", choices=sorted(CONTENT_TYPES), default="jpeg", help="frame encoding")
+    parser.add_argument("--particles", type=main.non_negative_int, default=12, help="central decoration particle count")
+    parser.add_argument("--highlight", default="Leo", help="comma-separated signs the hour hand highlights, or 'all'")
+    parser.add_argument("--signs", choices=main.SIGN_MODES, default="hour",
+                        help="highlight the sign under the hour hand, the Sun's sign, or the Sun's and the Moon's")
+    parser.add_argument("--theme", metavar="PATH", default="theme.json",
+                        help="theme file, reloaded when it changes (built-in defaults if missing)")
+    parser.add_argument("--low-power", action="store_true", help="turn off flame and decoration animation")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds (default: run until interrupted)")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between stats lines on stderr")
+    parser.add_argument("--clients", type=int, default=0, help="loopback viewers to start, for load testing")
+    parser.add_argument("--slow-clients", type=int, default=0, help="how many of the loopback viewers read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.25, help="seconds a slow viewer spends on each frame")
+    args = parser.parse_args()
+
+    main.app.init_display(args.size, headless=True)
+    main.app.load_theme(args.theme)
+    clock = main.AstrologicalClock(particle_count=args.particles, animate=not args.low_power,
+                                   highlight=None if args.highlight == "all" else args.highlight.split(","),
+                                   layout=main.ClockLayout((0, 0, *args.size)), show_controls=False,
+                                   sign_mode=args.signs)
+    clock.asset_loader.wait()
+    surface = pygame.Surface(args.size)
+
+    channel = FrameChannel()
+    stats = StreamStats()
+    server = StreamServer((args.host, args.port), channel, stats, CONTENT_TYPES[args.format])
+    host, port = server.server_address[:2]
+    threading.Thread(target=server.serve_forever, name="stream-server", daemon=True).start()
+    print(f"streaming on http://{host}:{port}/", file=sys.stderr)
+
+    clients = [LoopbackClient(host, port, args.slow_delay if i < args.slow_clients else 0.0, stats)
+               for i in range(args.clients)]
+    for client in clients:
+        client.thread.start()
+
+    try:
+        render_loop(clock, surface, channel, stats, args.fps, args.format, args.duration,
+                    print_report, args.report_interval, args.theme)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        channel.close()
+        server.shutdown()
+        server.server_close()
+
+    print_report(stats.snapshot())
+    if clients:
+        for client in clients:
+            client.thread.join(timeout=2)
+        for label, group in (("fast", [c for c in clients if not c.delay]), ("slow", [c for c in clients if c.delay])):
+            if group:
+                frames = [client.frames for client in group]
+                latencies = [latency for client in group for latency in client.latencies]
+                line = (f"{label} viewers: {len(group)}  frames received min {min(frames)}"
+                        f"  mean {sum(frames) / len(frames):.1f}  max {max(frames)}")
+                if latencies:
+                    fanout = main.summarize(latencies)
+                    line += f"  fan-out p50 {fanout['p50_ms']:6.2f}  p99 {fanout['p99_ms']:6.2f} ms"
+                print(line, file=sys.stderr)
+        errors = [client.error for client in clients if client.error]
+        if errors:
+            print(f"{len(errors)} viewer(s) failed, e.g. {errors[0]!r}", file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_stream())
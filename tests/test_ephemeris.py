@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+
+import ephemeris
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=datetime.timezone.utc).timestamp()
+
+def local(seconds):
+    # Tables are queried with naive local times, as the clock shows them
+    return datetime.datetime.fromtimestamp(seconds)
+
+@pytest.fixture
+def sun(tmp_path):
+    return ephemeris.IngressTable("sun", cache_dir=str(tmp_path))
+
+@pytest.fixture
+def moon(tmp_path):
+    return ephemeris.IngressTable("moon", cache_dir=str(tmp_path))
+
+# 2024 equinoxes and solstices (UTC), and the sign the Sun enters at each
+SEASONS_2024 = [
+    (utc(2024, 3, 20, 3, 6), "Aries"),
+    (utc(2024, 6, 20, 20, 51), "Cancer"),
+    (utc(2024, 9, 22, 12, 44), "Libra"),
+    (utc(2024, 12, 21, 9, 20), "Capricorn"),
+]
+
+@pytest.mark.parametrize("moment, sign", SEASONS_2024)
+def test_sun_ingresses_match_equinoxes_and_solstices(moment, sign):
+    ingresses = ephemeris.compute_ingresses("sun", 2024)
+    seconds = [seconds for seconds, index in ingresses[1:] if ephemeris.SIGNS[index] == sign]
+    assert len(seconds) == 1
+    # The series is good to about 0.01 degrees, a quarter of an hour of solar motion
+    assert abs(seconds[0] - moment) < 30 * 60
+
+def test_sun_table_has_twelve_ingresses_a_year():
+    ingresses = ephemeris.compute_ingresses("sun", 2024)
+    # Plus the sign at the start of the table
+    assert len(ingresses) == 13
+    assert [index for _, index in ingresses[1:]] == [10, 11, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+@pytest.mark.parametrize("moment, sign", SEASONS_2024)
+def test_sign_at_either_side_of_an_ingress(sun, moment, sign):
+    index = ephemeris.SIGNS.index(sign)
+    assert sun.sign_at(local(moment + 3600)) == index
+    assert sun.sign_at(local(moment - 3600)) == (index - 1) % 12
+
+def test_sign_at_across_new_year(sun, moon):
+    new_year = datetime.datetime(2025, 1, 1)
+    for when in (new_year - datetime.timedelta(minutes=1), new_year, new_year + datetime.timedelta(minutes=1)):
+        assert sun.sign_at(when) == ephemeris.SIGNS.index("Capricorn")
+    for hours in range(-36, 37, 3):
+        when = new_year + datetime.timedelta(hours=hours)
+        assert moon.sign_at(when) == ephemeris.sign_of(ephemeris.moon_longitude, when.timestamp())
+
+def test_sign_at_matches_the_longitude_over_a_month(moon):
+    start = utc(2024, 5, 1)
+    for hour in range(0, 31 * 24, 5):
+        seconds = start + hour * 3600
+        assert moon.sign_at(local(seconds)) == ephemeris.sign_of(ephemeris.moon_longitude, seconds)
+
+def test_cached_answer_is_not_reused_when_time_runs_backward(sun):
+    aries = SEASONS_2024[0][0]
+    later = sun.sign_at(local(aries + 86400))
+    assert later == ephemeris.SIGNS.index("Aries")
+    # Earlier than the cached interval: before the ingress, and a year back
+    assert sun.sign_at(local(aries - 86400)) == ephemeris.SIGNS.index("Pisces")
+    assert sun.sign_at(local(aries - 365 * 86400 + 86400 * 10)) == ephemeris.SIGNS.index("Aries")
+    assert sun.sign_at(datetime.datetime(2023, 8, 1)) == ephemeris.SIGNS.index("Leo")
+    # And forward again
+    assert sun.sign_at(local(aries + 86400)) == later
+
+def test_tables_are_cached_to_disk(tmp_path):
+    first = ephemeris.IngressTable("moon", cache_dir=str(tmp_path))
+    first.year(2024)
+    assert (tmp_path / "moon_2024_v1.json").exists()
+    second = ephemeris.IngressTable("moon", cache_dir=str(tmp_path))
+    assert second.year(2024) == first.year(2024)
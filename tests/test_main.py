@@ -0,0 +1,154 @@
+import json
+import datetime
+
+import pygame
+import pytest
+
+import main
+
+# Theme
+
+def test_theme_defaults():
+    theme = main.Theme()
+    assert theme.gold == main.GOLD
+    assert theme.clock_radius == main.CLOCK_RADIUS
+    assert theme.font_path == main.Theme.DEFAULT_FONT
+
+def test_theme_overrides_and_changes():
+    theme = main.Theme({"colors": {"gold": [1, 2, 3]}, "radii": {"zodiac": 250}})
+    assert theme.gold == (1, 2, 3)
+    assert theme.zodiac_radius == 250
+    assert main.Theme().changes(theme) == {"hands", "layout"}
+
+@pytest.mark.parametrize("values", [
+    ["gold"],
+    "gold",
+    {"colors": []},
+    {"radii": "big"},
+    {"zodiac": ["leo.png"]},
+    {"font": 3},
+    {"zodiac": {"Leo": 1}},
+    {"colors": {"purple": [1, 2, 3]}},
+    {"colors": {"gold": [1, 2]}},
+    {"colors": {"gold": [1, 2, 300]}},
+    {"radii": {"clock": 0}},
+    {"radii": {"moon": 10}},
+])
+def test_theme_rejects_malformed_values(values):
+    with pytest.raises(ValueError):
+        main.Theme(values)
+
+def test_theme_load(tmp_path):
+    path = tmp_path / "theme.json"
+    path.write_text(json.dumps({"colors": {"white": [250, 250, 250]}}))
+    assert main.Theme.load(str(path)).white == (250, 250, 250)
+    path.write_text("{not json")
+    with pytest.raises(ValueError):
+        main.Theme.load(str(path))
+
+# FixedTimestep
+
+def test_fixed_timestep_carries_the_remainder():
+    timestep = main.FixedTimestep(step=0.01)
+    assert timestep.advance(25000000) == 2
+    assert timestep.advance(5000000) == 1
+    assert timestep.accumulator_ns == 0
+
+def test_fixed_timestep_caps_a_stall():
+    timestep = main.FixedTimestep(step=0.01, max_steps=5)
+    assert timestep.advance(1000000000) == 5
+    assert timestep.accumulator_ns == 0
+
+# TimeEngine
+
+START = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+def test_time_engine_follows_its_source():
+    source = main.ManualClock()
+    engine = main.TimeEngine(source, start=START)
+    source.advance(1.5)
+    assert engine.now() == START + datetime.timedelta(seconds=1.5)
+
+def test_time_engine_warp():
+    source = main.ManualClock()
+    engine = main.TimeEngine(source, start=START, speed=1440)
+    source.advance(60)
+    assert engine.now() == START + datetime.timedelta(days=1)
+    # Animation time isn't warped
+    assert engine.elapsed_real_ns() == 60 * 1000000000
+
+def test_time_engine_set_time_keeps_advancing():
+    source = main.ManualClock()
+    engine = main.TimeEngine(source, start=START, speed=2)
+    source.advance(10)
+    engine.set_time(START)
+    source.advance(1)
+    assert engine.now() == START + datetime.timedelta(seconds=2)
+
+def test_time_engine_resyncs_to_the_system_clock():
+    engine = main.TimeEngine()
+    assert engine.follow_system
+    # Drifted an hour (say, a DST change) and due for a check
+    engine.anchor_time -= datetime.timedelta(hours=1)
+    engine.last_resync_ns -= main.TimeEngine.RESYNC_INTERVAL_NS
+    assert abs((engine.now() - datetime.datetime.now()).total_seconds()) < 1
+
+def test_time_engine_does_not_resync_a_set_time():
+    engine = main.TimeEngine()
+    engine.set_time(START)
+    engine.last_resync_ns -= main.TimeEngine.RESYNC_INTERVAL_NS
+    assert engine.now() - START < datetime.timedelta(seconds=1)
+
+# ZodiacIndex
+
+@pytest.fixture
+def zodiac_index():
+    return main.ZodiacIndex(main.create_zodiac_wheel(), highlight=("Leo",))
+
+@pytest.mark.parametrize("hour_angle, highlighted", [
+    (141, False),
+    (142, True),
+    (150, True),
+    (158, True),
+    (159, False),
+    (150 + 360, True),
+])
+def test_highlighted_sign_window(zodiac_index, hour_angle, highlighted):
+    sign = zodiac_index.highlighted_sign(hour_angle)
+    assert (sign is not None and sign.name == "Leo") == highlighted
+
+def test_highlighted_sign_only_for_chosen_signs(zodiac_index):
+    # Virgo's window; only Leo was asked for
+    assert zodiac_index.highlighted_sign(180) is None
+    every_sign = main.ZodiacIndex(main.create_zodiac_wheel(), highlight=None)
+    assert every_sign.highlighted_sign(180).name == "Virgo"
+    assert every_sign.highlighted_sign(165) is None
+
+# TextCache
+
+@pytest.fixture
+def font():
+    main.app.init_fonts()
+    return pygame.font.Font(None, 12)
+
+def test_text_cache_hits_and_misses(font):
+    cache = main.TextCache()
+    first = cache.render(font, "12:00", True, (255, 255, 255))
+    assert cache.render(font, "12:00", True, [255, 255, 255]) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_text_cache_evicts_the_least_recently_used(font):
+    cache = main.TextCache(max_size=2)
+    white = (255, 255, 255)
+    one = cache.render(font, "1", True, white)
+    cache.render(font, "2", True, white)
+    cache.render(font, "1", True, white)
+    cache.render(font, "3", True, white)
+    assert cache.render(font, "1", True, white) is one
+    assert (font, "2", True, white) not in cache.surfaces
+
+def test_text_cache_discard_fonts(font):
+    cache = main.TextCache()
+    cache.render(font, "1", True, (255, 255, 255))
+    cache.discard_fonts({font})
+    assert not cache.surfaces